@@ -3,7 +3,7 @@ import pprint
 import random as rand
 import sys
 
-from cfr_utils.hand_evaluation import get_bucket_number
+from cfr_utils.hand_evaluation import HandBuckets, load_tables
 from game_state import State
 from pypokerengine.players import BasePokerPlayer
 
@@ -22,6 +22,13 @@ class CFRAgent(BasePokerPlayer):
             strategy[line_split[0]] = [float(probStr) for probStr in line_split[1:4]]
     self.strategy = strategy
 
+    """ Buckets of the hole cards of the current hand, kept across its decisions """
+    self.hand_buckets = None
+
+    """ Tables are loaded here, so decisions never wait for them. Build tables/ before deploying
+    the agent (see README), otherwise the first agent of a process builds them. """
+    load_tables()
+
   def declare_action(self, valid_actions, hole_card, round_state):
     
     hole_card_chars = hole_card
@@ -32,9 +39,12 @@ class CFRAgent(BasePokerPlayer):
 
     num_rounds = state.get_round() + 1
 
+    if self.hand_buckets is None or self.hand_buckets.hole_cards != list(hole_card_chars):
+      self.hand_buckets = HandBuckets(hole_card_chars)
+
     for i in range(num_rounds) :
       round_community_cards = state.get_round_community_cards(i)
-      bucket_number = get_bucket_number(hole_card_chars, round_community_cards)      
+      bucket_number = self.hand_buckets.get_bucket(round_community_cards)
       info_set += str(bucket_number) + ':'
       street = state.get_round_street(i)
       action_histories_street = state.get_round_street_action_histories(street)
@@ -70,7 +80,7 @@ class CFRAgent(BasePokerPlayer):
     pass
 
   def receive_round_start_message(self, round_count, hole_card, seats):
-    pass
+    self.hand_buckets = None
 
   def receive_street_start_message(self, street, round_state):
     pass
@@ -0,0 +1,114 @@
+from argparse import ArgumentParser
+
+import numpy as np
+
+from cfr_utils.game import Game
+from cfr_utils.hand_evaluation import get_table_evaluator
+from cfr_utils.isomorphism import (HOLE_CARD_IDS, NUM_HOLE_COMBINATIONS, STRENGTH_SCALE, enumerate_board_classes,
+                                   get_board_classes_name, get_bucket_table_name, get_hand_strength_table_names)
+from cfr_utils.kmeans_buckets import build_kmeans_bucket_table
+from cfr_utils.table_store import get_table_path, load_table, save_table
+from constants import BUCKET_NUM, BUCKETING, EHS2_BUCKETING, EHS_BUCKETING, HAND_RANK_BUCKETING, KMEANS_BUCKETING
+from deuces.lookup import LookupTable
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    print('!!! Install tqdm library for better progress information !!!\n')
+
+
+"""Builds postflop bucket tables of all suit-isomorphic hands and stores them in the table directory.
+
+Tables are read by get_bucket_number and HandBuckets (used by CFRAgent) and by Cfr,
+which fall back to evaluating hands when the table of a street was not built.
+Tables depend on the number of buckets and the bucketing scheme, so they must be rebuilt
+after changing BUCKET_NUM or BUCKETING.
+
+Usage:
+python build_bucket_tables.py [--bucket-num {buckets}] [--bucketing {scheme}] [--batch-size {boards}]
+                              [--kmeans-batches {batches}] [--kmeans-batch-boards {boards}]
+
+  --bucket-num: Number of buckets, BUCKET_NUM by default.
+  --bucketing: Bucketing scheme, one of hand_rank, ehs, ehs2 or kmeans, BUCKETING by default.
+               E[HS], E[HS^2] and k-means bucketing need tables built by build_hand_strength_tables.py.
+               K-means bucketing clusters equity distributions of hands (see kmeans_buckets).
+  --batch-size: Number of canonical boards whose hands are evaluated at once by hand rank bucketing.
+  --kmeans-batches: Number of mini-batches of k-means clustering.
+  --kmeans-batch-boards: Number of random boards whose hands form a k-means mini-batch.
+"""
+
+def _get_strength_buckets(strength, bucket_num):
+    """Same bucketing as get_strength_bucket of hand_evaluation."""
+    return np.maximum(np.ceil(strength * bucket_num) - 1, 0).astype(np.int8)
+
+
+def build_hand_strength_bucket_table(num_board_cards, bucket_num, bucketing, batch_size):
+    """Returns board class keys and bucket numbers of all hands by their stored E[HS] or E[HS^2]."""
+    board_class_keys = load_table(get_board_classes_name(num_board_cards))
+    ehs_name, ehs2_name = get_hand_strength_table_names(num_board_cards)
+    strengths = load_table(ehs2_name if bucketing == EHS2_BUCKETING else ehs_name)
+    if board_class_keys is None or strengths is None:
+        raise ValueError('Hand strength tables must be built by build_hand_strength_tables.py first')
+    buckets = np.empty(len(strengths), dtype=np.int8)
+    for start in range(0, len(strengths), batch_size * NUM_HOLE_COMBINATIONS):
+        end = start + batch_size * NUM_HOLE_COMBINATIONS
+        buckets[start:end] = _get_strength_buckets(strengths[start:end] / float(STRENGTH_SCALE), bucket_num)
+    return board_class_keys, buckets
+
+
+def build_bucket_table(num_board_cards, bucket_num, batch_size):
+    """Returns board class keys and hand rank bucket numbers of all hands with given number of board cards."""
+    board_class_keys, canonical_boards = enumerate_board_classes(num_board_cards)
+    evaluator = get_table_evaluator()
+    hole_masks = (np.left_shift(1, HOLE_CARD_IDS.astype(np.int64))).sum(axis=1)
+    buckets = np.zeros((len(canonical_boards), NUM_HOLE_COMBINATIONS), dtype=np.int8)
+
+    batches_iterable = range(0, len(canonical_boards), batch_size)
+    try:
+        batches_iterable = tqdm(batches_iterable)
+        batches_iterable.set_description('Building %s card board buckets' % num_board_cards)
+    except NameError:
+        pass
+
+    for start in batches_iterable:
+        boards = canonical_boards[start:start + batch_size]
+        board_masks = (np.left_shift(1, boards.astype(np.int64))).sum(axis=1)
+        """ Hole cards that are on the board are never looked up, their bucket is left 0 """
+        valid = (board_masks[:, np.newaxis] & hole_masks[np.newaxis, :]) == 0
+        board_indices, hole_indices = np.nonzero(valid)
+        hands = np.column_stack([HOLE_CARD_IDS[hole_indices], boards[board_indices]])
+
+        """ Same strength as get_bucket_number evaluating the hand """
+        strength = 1.0 - evaluator.evaluate_batch(hands) / float(LookupTable.MAX_HIGH_CARD)
+        buckets[start + board_indices, hole_indices] = _get_strength_buckets(strength, bucket_num)
+
+    return board_class_keys, buckets.reshape(-1)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--bucket-num', type=int, default=BUCKET_NUM)
+    parser.add_argument('--bucketing', choices=[HAND_RANK_BUCKETING, EHS_BUCKETING, EHS2_BUCKETING, KMEANS_BUCKETING],
+                        default=BUCKETING)
+    parser.add_argument('--batch-size', type=int, default=2000)
+    parser.add_argument('--kmeans-batches', type=int, default=2000)
+    parser.add_argument('--kmeans-batch-boards', type=int, default=4)
+    args = parser.parse_args()
+
+    game = Game()
+    for round_index in range(1, game.get_num_rounds()):
+        num_board_cards = game.get_total_num_board_cards(round_index)
+        if args.bucketing == HAND_RANK_BUCKETING:
+            board_class_keys, buckets = build_bucket_table(num_board_cards, args.bucket_num, args.batch_size)
+        elif args.bucketing == KMEANS_BUCKETING:
+            board_class_keys, buckets = build_kmeans_bucket_table(num_board_cards, args.bucket_num,
+                                                                  args.kmeans_batches, args.kmeans_batch_boards)
+        else:
+            board_class_keys, buckets = build_hand_strength_bucket_table(num_board_cards, args.bucket_num,
+                                                                         args.bucketing, args.batch_size)
+        names = [get_board_classes_name(num_board_cards),
+                 get_bucket_table_name(num_board_cards, args.bucket_num, args.bucketing)]
+        for name, table in zip(names, [board_class_keys, buckets]):
+            if not save_table(name, table):
+                raise IOError('Cannot write table %s' % get_table_path(name))
+            print('Table %s written' % get_table_path(name))
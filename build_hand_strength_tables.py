@@ -0,0 +1,38 @@
+import os
+from argparse import ArgumentParser
+
+from cfr_utils.game import Game
+from cfr_utils.hand_strength import build_hand_strength_tables
+from cfr_utils.isomorphism import get_board_classes_name, get_hand_strength_table_names
+from cfr_utils.table_store import get_table_path, save_table
+
+
+"""Builds expected hand strength E[HS] and expected squared hand strength E[HS^2] tables
+of all suit-isomorphic postflop hands and stores them in the table directory.
+
+Streets are built from the river back to the flop, each one from the tables of the next one.
+The tables are used by EHS_BUCKETING and EHS2_BUCKETING (see constants.BUCKETING)
+and by build_bucket_tables.py.
+
+Usage:
+python build_hand_strength_tables.py [--workers {workers}] [--chunk-size {boards}]
+
+  --workers: Number of worker processes, number of CPUs by default.
+  --chunk-size: Number of canonical boards a worker computes at once.
+"""
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--chunk-size', type=int, default=100)
+    args = parser.parse_args()
+
+    game = Game()
+    for round_index in reversed(range(1, game.get_num_rounds())):
+        num_board_cards = game.get_total_num_board_cards(round_index)
+        tables = build_hand_strength_tables(num_board_cards, args.workers, args.chunk_size)
+        names = [get_board_classes_name(num_board_cards)] + list(get_hand_strength_table_names(num_board_cards))
+        for name, table in zip(names, tables):
+            if not save_table(name, table):
+                raise IOError('Cannot write table %s' % get_table_path(name))
+            print('Table %s written' % get_table_path(name))
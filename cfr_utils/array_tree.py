@@ -0,0 +1,320 @@
+import array
+
+import numpy as np
+
+from constants import BUCKET_NUM, NUM_ACTIONS
+from cfr_utils.build_tree import GameTreeBuilder
+from cfr_utils.game_tree import ActionNode, BoardCardsNode, HoleCardsNode, Node, TerminalNode
+
+TERMINAL_NODE = 0
+HOLE_CARDS_NODE = 1
+BOARD_CARDS_NODE = 2
+ACTION_NODE = 3
+
+
+class ArrayGameTree:
+    """Game tree stored in flat NumPy arrays instead of linked node objects.
+
+    Every node has an integer id. Action nodes are numbered first, so the id
+    of an action node is also its row in regret_sum, strategy, strategy_sum
+    and average_strategy, which all have shape (num_action_nodes, NUM_ACTIONS).
+
+    last_iteration holds the last training iteration in which each action
+    node was visited and log_regret_discounts of shape (num_action_nodes, 2)
+    the cumulative logarithms of DCFR positive and negative regret discounts
+    up to that visit, which lazily discounting CFR variants rely on.
+
+    Child ids are kept in the children index array of shape
+    (num_nodes, max(NUM_ACTIONS, bucket_num)), where the column is either
+    the action (for action nodes) or the bucket (for hole/board cards nodes)
+    and missing children are marked with -1.
+
+    Training arrays may be replaced, for example by shared memory copies,
+    and node views always access the current arrays through flat memoryviews
+    kept by their setters. Cfr keeps the current strategy of a visited node
+    in its view, so the strategy array is only filled by VectorCfr.
+    """
+
+    def __init__(self, node_type, player, card_count, parent, children, pot_commitment, root_id):
+        self.node_type = node_type
+        self.player = player
+        self.card_count = card_count
+        self.parent = parent
+        self.children = children
+        self.pot_commitment = pot_commitment
+        self.root_id = root_id
+
+        """ Node views read the structure through flat memoryviews, whose items are plain Python numbers """
+        self._node_type_values = memoryview(node_type)
+        self._player_values = memoryview(player)
+        self._card_count_values = memoryview(card_count)
+        self._children_values = memoryview(children.reshape(-1))
+        self._pot_commitment_values = memoryview(pot_commitment.reshape(-1))
+        self.children_width = children.shape[1]
+
+        self.num_action_nodes = int(np.count_nonzero(node_type == ACTION_NODE))
+        self.regret_sum = np.zeros((self.num_action_nodes, NUM_ACTIONS))
+        self.strategy = np.zeros((self.num_action_nodes, NUM_ACTIONS))
+        self.strategy_sum = np.zeros((self.num_action_nodes, NUM_ACTIONS))
+        self.average_strategy = np.zeros((self.num_action_nodes, NUM_ACTIONS))
+        self.last_iteration = np.zeros(self.num_action_nodes, dtype=np.int32)
+        self.log_regret_discounts = np.zeros((self.num_action_nodes, 2))
+
+    @property
+    def num_nodes(self):
+        return len(self.node_type)
+
+    @property
+    def root(self):
+        return self.node(self.root_id)
+
+    def node(self, node_id):
+        """Returns node object view of node with given id."""
+        return _NODE_VIEW_TYPES[self._node_type_values[node_id]](self, int(node_id))
+
+    def valid_actions_mask(self):
+        """Returns boolean array (num_action_nodes, NUM_ACTIONS) of actions available in each action node."""
+        return self.children[:self.num_action_nodes, :NUM_ACTIONS] >= 0
+
+    def calculate_average_strategy(self):
+        """Normalizes strategy sums of all action nodes at once into average_strategy."""
+        valid_actions = self.valid_actions_mask()
+        normalizing_sum = self.strategy_sum.sum(axis=1, keepdims=True)
+        uniform = valid_actions / valid_actions.sum(axis=1, keepdims=True)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            normalized = np.where(valid_actions, self.strategy_sum / normalizing_sum, 0)
+        self.average_strategy = np.where(normalizing_sum > 0, normalized, uniform)
+
+
+def _training_array(name):
+    """Property of training array, whose setter also keeps a flat memoryview of the array for node views."""
+    values_name = '_%s_values' % name
+
+    def get_array(tree):
+        return tree.__dict__[name]
+
+    def set_array(tree, values):
+        tree.__dict__[name] = values
+        tree.__dict__[values_name] = memoryview(values.reshape(-1))
+
+    return property(get_array, set_array)
+
+
+for _name in ['regret_sum', 'strategy', 'strategy_sum', 'average_strategy', 'last_iteration', 'log_regret_discounts']:
+    setattr(ArrayGameTree, _name, _training_array(_name))
+
+
+class _ChildMap(dict):
+    """Read-only dictionary of children of array tree node. It stores child ids
+    by their action or bucket and creates views of children when they are accessed."""
+
+    def __getitem__(self, key):
+        child_id = dict.__getitem__(self, key)
+        return _NODE_VIEW_TYPES[self.tree._node_type_values[child_id]](self.tree, child_id)
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+    def _read_only(self, *args, **kwargs):
+        raise RuntimeError('Array game tree structure is read-only')
+
+    __setitem__ = __delitem__ = clear = pop = popitem = setdefault = update = _read_only
+
+
+class _view_attribute(object):
+    """Attribute of a node view read from the tree on first access and then kept in the view,
+    which lives for a single visit, so later accesses are plain attribute lookups."""
+
+    def __init__(self, read):
+        self.read = read
+        self.name = read.__name__
+
+    def __get__(self, view, view_type=None):
+        if view is None:
+            return self
+        value = view.__dict__[self.name] = self.read(view)
+        return value
+
+
+class _ArrayNode(Node):
+    """Lightweight view of a single node of ArrayGameTree.
+
+    Views are created on demand and behave like the node classes of game_tree,
+    so code working with the object tree also works with the array tree.
+    """
+
+    def __init__(self, tree, node_id):
+        self.tree = tree
+        self.node_id = node_id
+
+    @_view_attribute
+    def children(self):
+        tree = self.tree
+        start = self.node_id * tree.children_width
+        children = _ChildMap({key: child_id for key, child_id
+                              in enumerate(tree._children_values[start:start + tree.children_width])
+                              if child_id >= 0})
+        children.tree = tree
+        return children
+
+    @property
+    def parent(self):
+        parent_id = self.tree.parent[self.node_id]
+        return None if parent_id < 0 else self.tree.node(parent_id)
+
+    def set_child(self, key, child):
+        raise RuntimeError('Array game tree structure is read-only')
+
+    def __eq__(self, other):
+        return isinstance(other, _ArrayNode) and self.tree is other.tree and self.node_id == other.node_id
+
+    def __hash__(self):
+        return hash((id(self.tree), self.node_id))
+
+
+class ArrayTerminalNode(_ArrayNode, TerminalNode):
+    @property
+    def pot_commitment(self):
+        num_players = self.tree.pot_commitment.shape[1]
+        start = self.node_id * num_players
+        return self.tree._pot_commitment_values[start:start + num_players].tolist()
+
+
+class ArrayHoleCardsNode(_ArrayNode, HoleCardsNode):
+    @property
+    def card_count(self):
+        return self.tree._card_count_values[self.node_id]
+
+
+class ArrayBoardCardsNode(_ArrayNode, BoardCardsNode):
+    @property
+    def card_count(self):
+        return self.tree._card_count_values[self.node_id]
+
+
+class ArrayActionNode(_ArrayNode, ActionNode):
+    """Action node view. Its regret_sum and strategy_sum are memoryviews of the node's row
+    of the training arrays, whose items are plain Python floats. Writes go directly to the arrays,
+    which may be shared by parallel workers. The current strategy is recomputed on every visit,
+    so it is kept in a list of the view."""
+
+    @property
+    def player(self):
+        return self.tree._player_values[self.node_id]
+
+    @_view_attribute
+    def regret_sum(self):
+        start = self.node_id * NUM_ACTIONS
+        return self.tree._regret_sum_values[start:start + NUM_ACTIONS]
+
+    @_view_attribute
+    def strategy_sum(self):
+        start = self.node_id * NUM_ACTIONS
+        return self.tree._strategy_sum_values[start:start + NUM_ACTIONS]
+
+    @_view_attribute
+    def strategy(self):
+        return [0] * NUM_ACTIONS
+
+    @_view_attribute
+    def log_regret_discounts(self):
+        start = self.node_id * 2
+        return self.tree._log_regret_discounts_values[start:start + 2]
+
+    @property
+    def average_strategy(self):
+        start = self.node_id * NUM_ACTIONS
+        return self.tree._average_strategy_values[start:start + NUM_ACTIONS]
+
+    @average_strategy.setter
+    def average_strategy(self, value):
+        self.tree.average_strategy[self.node_id] = value
+
+    @property
+    def last_iteration(self):
+        return self.tree._last_iteration_values[self.node_id]
+
+    @last_iteration.setter
+    def last_iteration(self, value):
+        self.tree._last_iteration_values[self.node_id] = value
+
+
+_NODE_VIEW_TYPES = {
+    TERMINAL_NODE: ArrayTerminalNode,
+    HOLE_CARDS_NODE: ArrayHoleCardsNode,
+    BOARD_CARDS_NODE: ArrayBoardCardsNode,
+    ACTION_NODE: ArrayActionNode,
+}
+
+
+class ArrayGameTreeBuilder(GameTreeBuilder):
+    """Builds ArrayGameTree without ever allocating the node objects."""
+
+    def __init__(self, game):
+        super(ArrayGameTreeBuilder, self).__init__(game)
+        self.children_width = max(NUM_ACTIONS, BUCKET_NUM)
+
+    def build_tree(self):
+        """Builds the game tree and returns view of its root HoleCardsNode."""
+        self._node_type = array.array('b')
+        self._player = array.array('b')
+        self._card_count = array.array('b')
+        self._parent = array.array('i')
+        self._children = array.array('i')
+        self._pot_commitment = array.array('i')
+
+        root_id = super(ArrayGameTreeBuilder, self).build_tree()
+
+        num_players = self.game.get_num_players()
+        node_type = np.frombuffer(self._node_type, dtype=np.int8)
+
+        """ Renumber nodes so that action nodes come first and ids can index strategy arrays """
+        order = np.argsort(node_type != ACTION_NODE, kind='stable')
+        new_ids = np.empty(len(order), dtype=np.int32)
+        new_ids[order] = np.arange(len(order), dtype=np.int32)
+
+        def remap(ids):
+            return np.where(ids >= 0, new_ids[np.maximum(ids, 0)], -1).astype(np.int32)
+
+        children = np.frombuffer(self._children, dtype=np.int32).reshape(-1, self.children_width)
+        tree = ArrayGameTree(
+            node_type[order],
+            np.frombuffer(self._player, dtype=np.int8)[order],
+            np.frombuffer(self._card_count, dtype=np.int8)[order],
+            remap(np.frombuffer(self._parent, dtype=np.int32)[order]),
+            remap(children[order]),
+            np.frombuffer(self._pot_commitment, dtype=np.int32).reshape(-1, num_players)[order],
+            int(new_ids[root_id]))
+
+        del self._node_type, self._player, self._card_count, self._parent, self._children, self._pot_commitment
+        return tree.root
+
+    def _add_node(self, parent, child_key, node_type, player=-1, card_count=0, pot_commitment=None):
+        node_id = len(self._node_type)
+        self._node_type.append(node_type)
+        self._player.append(player)
+        self._card_count.append(card_count)
+        self._parent.append(-1 if parent is None else parent)
+        self._children.extend([-1] * self.children_width)
+        self._pot_commitment.extend(pot_commitment or [0] * self.game.get_num_players())
+        if parent is not None:
+            self._children[parent * self.children_width + child_key] = node_id
+        return node_id
+
+    def _create_root(self, card_count):
+        return self._add_node(None, None, HOLE_CARDS_NODE, card_count=card_count)
+
+    def _create_board_cards_node(self, parent, child_key, card_count):
+        return self._add_node(parent, child_key, BOARD_CARDS_NODE, card_count=card_count)
+
+    def _create_action_node(self, parent, child_key, player):
+        return self._add_node(parent, child_key, ACTION_NODE, player=player)
+
+    def _create_terminal_node(self, parent, child_key, pot_commitment):
+        return self._add_node(parent, child_key, TERMINAL_NODE, pot_commitment=pot_commitment)
@@ -0,0 +1,76 @@
+import numpy as np
+
+from constants import BUCKET_NUM, NUM_ACTIONS, FOLD
+from cfr_utils.array_tree import ACTION_NODE, BOARD_CARDS_NODE, TERMINAL_NODE
+from cfr_utils.vector_cfr import get_terminal_values
+
+
+class BestResponse:
+    """Best response against the average strategy stored in array game tree.
+
+    Like VectorCfr, the public tree is traversed once with vectors indexed
+    by bucket sequences (see BucketModel). The responding player's value of
+    each information set is maximized over actions, while the opponent's reach
+    probabilities follow its average strategy. Chance probabilities come from
+    the bucket model, so values are those of the bucketed (abstract) game.
+    """
+
+    def __init__(self, tree, bucket_model):
+        """Build new best response evaluator.
+        Args:
+            tree (ArrayGameTree): Game tree with calculated average_strategy.
+            bucket_model (BucketModel): Chance model of the bucketed game.
+        """
+        if tree.pot_commitment.shape[1] != 2:
+            raise ValueError('Best response supports only games with 2 players')
+        self.tree = tree
+        self.bucket_model = bucket_model
+
+    def get_value(self, player):
+        """Returns expected value of best response of given player against the other player."""
+        root_ids = self.tree.children[self.tree.root_id, :BUCKET_NUM]
+        opponent_reach = np.ones(BUCKET_NUM)
+        return float(self._best_response(root_ids, 0, player, opponent_reach, [False, False]).sum())
+
+    def get_exploitability(self):
+        """Returns mean value of both players' best responses, which is 0 for Nash equilibrium."""
+        return (self.get_value(0) + self.get_value(1)) / 2
+
+    def _best_response(self, node_ids, round_index, player, opponent_reach, players_folded):
+        """Returns best response values of the player's bucket sequences in given nodes."""
+        node_type = self.tree.node_type[node_ids[0]]
+        if node_type == TERMINAL_NODE:
+            reach_probs = [opponent_reach] * 2
+            return get_terminal_values(self.bucket_model, self.tree.pot_commitment[node_ids[0]],
+                                       round_index, reach_probs, players_folded)[player]
+        elif node_type == BOARD_CARDS_NODE:
+            next_node_ids = self.tree.children[node_ids, :BUCKET_NUM].reshape(-1)
+            next_values = self._best_response(next_node_ids, round_index + 1, player,
+                                              np.repeat(opponent_reach, BUCKET_NUM), players_folded)
+            return next_values.reshape(-1, BUCKET_NUM).sum(axis=1)
+        elif node_type == ACTION_NODE:
+            return self._best_response_action(node_ids, round_index, player, opponent_reach, players_folded)
+        raise RuntimeError('Unexpected node type %s inside the game tree' % node_type)
+
+    def _best_response_action(self, node_ids, round_index, player, opponent_reach, players_folded):
+        tree = self.tree
+        node_player = tree.player[node_ids[0]]
+        actions = [a for a in range(NUM_ACTIONS) if tree.children[node_ids[0], a] >= 0]
+
+        action_values = []
+        for a in actions:
+            next_opponent_reach = opponent_reach
+            if node_player != player:
+                next_opponent_reach = opponent_reach * tree.average_strategy[node_ids, a]
+
+            next_players_folded = players_folded
+            if a == FOLD:
+                next_players_folded = list(players_folded)
+                next_players_folded[node_player] = True
+
+            action_values.append(self._best_response(tree.children[node_ids, a], round_index, player,
+                                                     next_opponent_reach, next_players_folded))
+
+        if node_player == player:
+            return np.max(action_values, axis=0)
+        return np.sum(action_values, axis=0)
@@ -0,0 +1,118 @@
+import numpy as np
+
+import cfr_utils.hand_evaluation as HSEval
+from constants import BUCKET_NUM
+from pypokerengine.utils.card_utils import gen_deck
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
+
+
+class BucketModel:
+    """Chance model of the bucketed (abstract) game.
+
+    A player's bucket sequence in round k is the list of buckets the player was
+    assigned in rounds 0..k, encoded as a single integer in base BUCKET_NUM
+    with the earliest bucket as the most significant digit. This matches
+    the order in which the game tree branches on buckets.
+
+    joint[k][s0, s1] is the probability that player 0 holds bucket sequence s0
+    and player 1 holds bucket sequence s1 in round k. win[s0, s1] and tie[s0, s1]
+    are probabilities of reaching the final round with sequences s0 and s1
+    and player 0 winning or tying the showdown.
+    """
+
+    def __init__(self, joint, win, tie, num_samples):
+        self.joint = joint
+        self.win = win
+        self.tie = tie
+        self.loss = joint[-1] - win - tie
+        self.num_samples = num_samples
+
+    @property
+    def num_rounds(self):
+        return len(self.joint)
+
+    @staticmethod
+    def _get_bucket_sequence(game, hole_cards, board_cards):
+        hole_cards_str = [str(card) for card in hole_cards]
+        sequence = 0
+        for round_index in range(game.get_num_rounds()):
+            community_cards = board_cards[:game.get_total_num_board_cards(round_index)]
+            bucket = HSEval.get_bucket_number(hole_cards_str, [str(card) for card in community_cards])
+            sequence = sequence * BUCKET_NUM + bucket
+        return sequence
+
+    @staticmethod
+    def estimate(game, num_samples, show_progress=True):
+        """Estimates the model by sampling deals of the game.
+
+        Args:
+            game (Game): Game definition object.
+            num_samples (int): Number of sampled deals.
+            show_progress (bool): Show sampling progress bar.
+
+        Returns:
+            BucketModel: Estimated model.
+        """
+        if game.get_num_players() != 2:
+            raise ValueError('Bucket model supports only games with 2 players')
+
+        num_rounds = game.get_num_rounds()
+        num_board_cards = game.get_total_num_board_cards(num_rounds - 1)
+        num_sequences = BUCKET_NUM ** num_rounds
+
+        samples_iterable = range(num_samples)
+        if show_progress:
+            try:
+                samples_iterable = tqdm(samples_iterable)
+                samples_iterable.set_description('Estimating bucket model')
+            except NameError:
+                pass
+
+        sequence_pairs = np.zeros(num_samples, dtype=np.int64)
+        outcomes = np.zeros(num_samples, dtype=np.int8)
+        for i in samples_iterable:
+            deck = gen_deck()
+            deck.shuffle()
+            hole_cards = [deck.draw_cards(game.get_num_hole_cards()) for p in range(2)]
+            board_cards = deck.draw_cards(num_board_cards)
+
+            sequences = [BucketModel._get_bucket_sequence(game, hole_cards[p], board_cards) for p in range(2)]
+            sequence_pairs[i] = sequences[0] * num_sequences + sequences[1]
+
+            winners = HSEval.get_winners(hole_cards, [False, False], board_cards)
+            outcomes[i] = 0 if len(winners) > 1 else (1 if winners[0] == 0 else -1)
+
+        def to_matrix(pairs):
+            counts = np.bincount(pairs, minlength=num_sequences ** 2)
+            return counts.reshape(num_sequences, num_sequences) / float(num_samples)
+
+        final_joint = to_matrix(sequence_pairs)
+        joint = []
+        for round_index in range(num_rounds):
+            round_sequences = BUCKET_NUM ** (round_index + 1)
+            later_sequences = BUCKET_NUM ** (num_rounds - round_index - 1)
+            joint.append(final_joint
+                         .reshape(round_sequences, later_sequences, round_sequences, later_sequences)
+                         .sum(axis=(1, 3)))
+
+        return BucketModel(joint, to_matrix(sequence_pairs[outcomes == 1]),
+                           to_matrix(sequence_pairs[outcomes == 0]), num_samples)
+
+    def save(self, path):
+        """Saves the model into .npz file."""
+        arrays = {'joint_%s' % k: joint for k, joint in enumerate(self.joint)}
+        np.savez(path, win=self.win, tie=self.tie, num_samples=self.num_samples, **arrays)
+
+    @staticmethod
+    def load(path):
+        """Loads the model saved by save."""
+        with np.load(path) as data:
+            num_rounds = len([key for key in data.files if key.startswith('joint_')])
+            joint = [data['joint_%s' % k] for k in range(num_rounds)]
+            if joint[0].shape[0] != BUCKET_NUM:
+                raise ValueError('Bucket model %s was estimated for different number of buckets' % path)
+            return BucketModel(joint, data['win'], data['tie'], int(data['num_samples']))
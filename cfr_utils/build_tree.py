@@ -42,13 +42,32 @@ class GameTreeBuilder:
     def build_tree(self):
         """Builds and returns a game tree rooted at HoleCardsNode."""
 
-        root = HoleCardsNode(None, self.game.get_num_hole_cards())
+        root = self._create_root(self.game.get_num_hole_cards())
         for bucket in range(BUCKET_NUM):
             game_state = GameTreeBuilder.GameState(self.game, [bucket])
             self._generate_board_cards_node(root, bucket, game_state)
 
         return root
 
+    def _create_root(self, card_count):
+        """Creates the root hole cards node. Overridden by alternative tree backends."""
+        return HoleCardsNode(None, card_count)
+
+    def _create_board_cards_node(self, parent, child_key, card_count):
+        new_node = BoardCardsNode(parent, card_count)
+        parent.children[child_key] = new_node
+        return new_node
+
+    def _create_action_node(self, parent, child_key, player):
+        new_node = ActionNode(parent, player)
+        parent.children[child_key] = new_node
+        return new_node
+
+    def _create_terminal_node(self, parent, child_key, pot_commitment):
+        new_node = TerminalNode(parent, pot_commitment)
+        parent.children[child_key] = new_node
+        return new_node
+
     def remove_hole_cards(self, deck, hole_cards_indexes):
         next_deck = list(deck)
         """ Delete the two Hole cards """
@@ -63,8 +82,7 @@ class GameTreeBuilder:
         if num_board_cards <= 0:
             self._generate_action_node(parent, child_key, game_state)
         else:
-            new_node = BoardCardsNode(parent, num_board_cards)
-            parent.children[child_key] = new_node
+            new_node = self._create_board_cards_node(parent, child_key, num_board_cards)
 
             bucket_numbers = range(BUCKET_NUM)
             for bucket in bucket_numbers:
@@ -96,12 +114,10 @@ class GameTreeBuilder:
                 self._generate_board_cards_node(parent, child_key, next_game_state)
             else:
                 """ This game tree branch ended, close it with terminal node """
-                new_node = TerminalNode(parent, pot_commitment)
-                parent.children[child_key] = new_node
+                self._create_terminal_node(parent, child_key, pot_commitment)
             return
 
-        new_node = ActionNode(parent, current_player)
-        parent.children[child_key] = new_node
+        new_node = self._create_action_node(parent, child_key, current_player)
 
         round_index = self.game.get_num_rounds() - rounds_left
         next_player = (current_player + 1) % self.game.get_num_players()
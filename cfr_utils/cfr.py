@@ -1,19 +1,16 @@
-import copy
 import math
 import operator
+import random
 from functools import reduce
 
 import cfr_utils.hand_evaluation as HSEval
+from cfr_utils.array_tree import ArrayGameTreeBuilder
 from cfr_utils.build_tree import GameTreeBuilder
 from constants import NUM_ACTIONS, FOLD
 from cfr_utils.game_tree import ActionNode, BoardCardsNode, HoleCardsNode, TerminalNode
-from pypokerengine.utils.card_utils import (estimate_hole_card_win_rate,
-                                            gen_deck)
-
-try:
-    from joblib import Parallel, delayed
-except ImportError:
-    print('!!! Install joblib library to enable  more efficient cfr training on multiple threads !!!\n')
+from cfr_utils.table_evaluator import IncrementalEvaluator
+from pypokerengine.engine.card import Card
+from pypokerengine.utils.card_utils import estimate_hole_card_win_rate
 
 try:
     from tqdm import tqdm
@@ -21,26 +18,176 @@ except ImportError:
     pass
 
 
+VANILLA = 'vanilla'
+CFR_PLUS = 'cfr+'
+DCFR = 'dcfr'
+VARIANTS = [VANILLA, CFR_PLUS, DCFR]
+
+CHANCE_SAMPLING = 'chance'
+EXTERNAL_SAMPLING = 'external'
+OUTCOME_SAMPLING = 'outcome'
+SAMPLING_SCHEMES = [CHANCE_SAMPLING, EXTERNAL_SAMPLING, OUTCOME_SAMPLING]
+
+""" Cards are dealt as pypokerengine card ids, Card objects are shared lookups by id """
+CARD_IDS = range(1, 53)
+CARDS = [None] + [Card.from_id(card_id) for card_id in CARD_IDS]
+
+
+class DiscountSchedule:
+    """Iteration dependent discount factors of Discounted CFR.
+
+    After iteration t positive regrets are multiplied by t^alpha / (t^alpha + 1),
+    negative regrets by t^beta / (t^beta + 1) and strategy sums by (t / (t + 1))^gamma.
+    Strategy sum discounts over a range of iterations telescope to a closed form.
+    Regret discounts do not, so nodes keep the cumulative logarithms of regret
+    discounts up to their last visit, and the schedule only keeps them for the last
+    iteration it was asked for. This allows nodes to be discounted lazily, only when
+    they are visited, without storing anything per iteration.
+    """
+
+    def __init__(self, alpha=1.5, beta=0.0, gamma=2.0):
+        self.alpha = alpha
+        self.beta = beta
+        self.gamma = gamma
+        self._log_discounts_iteration = 0
+        self._log_discounts = (0.0, 0.0)
+
+    def _log_regret_factors(self, t):
+        return (self.alpha * math.log(t) - math.log(t ** self.alpha + 1),
+                self.beta * math.log(t) - math.log(t ** self.beta + 1))
+
+    def get_log_regret_discounts(self, iteration):
+        """Returns cumulative logarithms of positive and negative regret discounts after iterations 1..iteration.
+        They are advanced from the iteration of the previous call, which is cheap as training moves forward,
+        and recomputed from the first iteration when asked for an earlier iteration."""
+        if iteration < self._log_discounts_iteration:
+            self._log_discounts_iteration = 0
+            self._log_discounts = (0.0, 0.0)
+        positive_log, negative_log = self._log_discounts
+        for t in range(self._log_discounts_iteration + 1, iteration + 1):
+            positive_factor, negative_factor = self._log_regret_factors(t)
+            positive_log += positive_factor
+            negative_log += negative_factor
+        self._log_discounts_iteration = iteration
+        self._log_discounts = (positive_log, negative_log)
+        return self._log_discounts
+
+    def get_strategy_discount(self, first_iteration, last_iteration):
+        """Returns discount of strategy sums accumulated after iterations first_iteration..last_iteration (inclusive)."""
+        return (first_iteration / float(last_iteration + 1)) ** self.gamma
+
+    def get_factors(self, first_iteration, last_iteration):
+        """Returns discounts of positive regrets, negative regrets and strategy sums accumulated
+        after iterations first_iteration..last_iteration (inclusive), computed over the range directly."""
+        positive_log = negative_log = 0.0
+        for t in range(first_iteration, last_iteration + 1):
+            positive_factor, negative_factor = self._log_regret_factors(t)
+            positive_log += positive_factor
+            negative_log += negative_factor
+        return [math.exp(positive_log), math.exp(negative_log),
+                self.get_strategy_discount(first_iteration, last_iteration)]
+
+
+class RunningStatistics:
+    """Running mean and variance of a sampled value (Welford's algorithm)."""
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.max = None
+        self._squared_deviation_sum = 0.0
+
+    def add(self, value):
+        self.count += 1
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._squared_deviation_sum += delta * (value - self.mean)
+        self.max = value if self.max is None else max(self.max, value)
+
+    @property
+    def variance(self):
+        return self._squared_deviation_sum / (self.count - 1) if self.count > 1 else 0.0
+
+    def __str__(self):
+        return 'mean %s, variance %s, max %s over %s samples' % (self.mean, self.variance, self.max, self.count)
+
+
 class Cfr:
 
-    def __init__(self, game):
+    def __init__(self, game, array_tree=False, variant=VANILLA, discount_schedule=None,
+                 sampling=CHANCE_SAMPLING, exploration=0.6, pruning_threshold=None, pruning_interval=20,
+                 game_tree=None):
         """Build new CFR instance.
         Args:
             game (Game): game definition object.
+            array_tree (bool): Store the game tree in contiguous NumPy arrays
+                               instead of node objects to reduce memory usage.
+            variant (str): CFR variant, one of VARIANTS. CFR+ floors cumulative
+                           regrets at zero and weights the average strategy
+                           by iteration number. DCFR discounts regrets and
+                           strategy sums by discount_schedule.
+            discount_schedule (DiscountSchedule): DCFR discount parameters,
+                           alpha=1.5, beta=0 and gamma=2 when not provided.
+            sampling (str): Monte Carlo sampling scheme, one of SAMPLING_SCHEMES.
+                           Chance sampling explores all actions of both players
+                           for one sampled deal. External sampling explores all
+                           actions of one traversing player and samples a single
+                           action of the opponent, alternating the traverser.
+                           Outcome sampling follows a single sampled trajectory.
+            exploration (float): Probability of exploring uniformly random action
+                           of the traversing player in outcome sampling.
+            pruning_threshold (float): Regret-based pruning skips subtrees of actions
+                           played with zero probability whose cumulative regret is below
+                           this threshold. Pruning is disabled when not provided. It has
+                           no effect with CFR+, which keeps regrets non-negative, and with
+                           outcome sampling, which follows a single action anyway.
+            pruning_interval (int): Every pruning_interval-th iteration traverses
+                           all actions, so regrets of pruned actions can recover.
+            game_tree (Node): Already built game tree, for example one restored
+                           from a checkpoint. Built from game when not provided.
         """
-        self.game = game
+        if variant not in VARIANTS:
+            raise ValueError('Unknown CFR variant %s' % variant)
+        if sampling not in SAMPLING_SCHEMES:
+            raise ValueError('Unknown sampling scheme %s' % sampling)
 
-        game_tree_builder = GameTreeBuilder(game)
+        self.game = game
+        self.array_tree = array_tree
+        self.variant = variant
+        self.discount_schedule = discount_schedule or DiscountSchedule()
+        self.sampling = sampling
+        self.exploration = exploration
+        self.pruning_threshold = pruning_threshold
+        self.pruning_interval = pruning_interval
+        self.iteration = 0
+        """ Bucket keys of each street and hands evaluated when bucket tables fall back, of the cards dealt last """
+        self._dealt_cards = None
+        self._dealt_hands = None
+        self._dealt_bucket_keys = None
+
+        """ Outcome sampling variance statistics of sampled root utilities and importance weights """
+        self.utility_statistics = RunningStatistics()
+        self.importance_weight_statistics = RunningStatistics()
+
+        if game_tree is not None:
+            self.game_tree = game_tree
+        else:
+            if array_tree:
+                game_tree_builder = ArrayGameTreeBuilder(game)
+            else:
+                game_tree_builder = GameTreeBuilder(game)
 
-        try:
-            with tqdm(total=1) as progress:
-                progress.set_description('Building game tree')
+            try:
+                with tqdm(total=1) as progress:
+                    progress.set_description('Building game tree')
+                    self.game_tree = game_tree_builder.build_tree()
+                    progress.update(1)
+            except NameError:
                 self.game_tree = game_tree_builder.build_tree()
-                progress.update(1)
-        except NameError:
-            self.game_tree = game_tree_builder.build_tree()
 
         self.player_count = game.get_num_players()
+        self.num_dealt_cards = (self.player_count * game.get_num_hole_cards()
+                                + game.get_total_num_board_cards(game.get_num_rounds() - 1))
 
     @staticmethod
     def _calculate_node_average_strategy(node):
@@ -60,7 +207,7 @@ class Cfr:
 
     @staticmethod
     def _calculate_tree_average_strategy(node):
-        if type(node) == ActionNode:
+        if isinstance(node, ActionNode):
             Cfr._calculate_node_average_strategy(node)
         if node.children:
             for child in node.children.values():
@@ -91,43 +238,74 @@ class Cfr:
                 iterations_iterable = range(iterations)
 
         for i in iterations_iterable:
-            current_deck = gen_deck()
-            current_deck.shuffle()
+            self.run_iteration()
+
+        self.calculate_average_strategy()
 
+    def calculate_average_strategy(self):
+        """Stores the average strategy in average_strategy of each ActionNode in game tree."""
+        if self.array_tree:
+            self.game_tree.tree.calculate_average_strategy()
+        else:
+            Cfr._calculate_tree_average_strategy(self.game_tree)
+
+    def run_iteration(self, deck=None):
+        """Run a single CFR iteration without recalculating the average strategy.
+
+        Args:
+            deck (Deck): Deck to deal the cards from, for example to train on logged
+                         hands. Cards are drawn from the end of the deck. A freshly
+                         shuffled deck is used when not provided.
+        """
+        self.iteration += 1
+
+        if self.sampling == EXTERNAL_SAMPLING:
+            for traverser in range(self.player_count):
+                self._cfr_external(
+                    [self.game_tree] * self.player_count, traverser,
+                    self._deal_cards(deck), 0,
+                    [False] * self.player_count)
+        elif self.sampling == OUTCOME_SAMPLING:
+            for traverser in range(self.player_count):
+                utility, tail_reach, sample_reach = self._cfr_outcome(
+                    [self.game_tree] * self.player_count, traverser,
+                    self._deal_cards(deck), 0,
+                    [False] * self.player_count, 1, 1, 1)
+                self.utility_statistics.add(utility * tail_reach)
+                self.importance_weight_statistics.add(1.0 / sample_reach)
+        else:
             self._cfr(
                 [self.game_tree] * self.player_count,
                 [1] * self.player_count,
-                None, [], current_deck,
+                self._deal_cards(deck), 0,
                 [False] * self.player_count)
 
-        Cfr._calculate_tree_average_strategy(self.game_tree)
-
-    def _cfr(self, nodes, reach_probs, hole_cards, board_cards, deck, players_folded):
+    def _cfr(self, nodes, reach_probs, cards, num_board_cards, players_folded):
         """
         An enactment of polymorphism here that checks the type of the current node and
         calls its respective function in a recursive manner.
         """
-        node_type = type(nodes[0])
-        if node_type == TerminalNode:
+        node = nodes[0]
+        if isinstance(node, TerminalNode):
             return self._cfr_terminal(
-                nodes, hole_cards, board_cards, deck,
+                nodes, cards, num_board_cards,
                 players_folded)
-        elif node_type == HoleCardsNode:
+        elif isinstance(node, HoleCardsNode):
             return self._cfr_hole_cards(
                 nodes, reach_probs,
-                hole_cards, board_cards, deck,
+                cards, num_board_cards,
                 players_folded)
-        elif node_type == BoardCardsNode:
+        elif isinstance(node, BoardCardsNode):
             return self._cfr_board_cards(
                 nodes, reach_probs,
-                hole_cards, board_cards, deck,
+                cards, num_board_cards,
                 players_folded)
         return self._cfr_action(
             nodes, reach_probs,
-            hole_cards, board_cards, deck,
+            cards, num_board_cards,
             players_folded)
 
-    def _cfr_terminal(self, nodes, hole_cards, board_cards, deck, players_folded):
+    def _cfr_terminal(self, nodes, cards, num_board_cards, players_folded):
         player_count = self.player_count
         pot_commitment = nodes[0].pot_commitment
 
@@ -136,49 +314,113 @@ class Cfr:
             return [-pot_commitment[player] if players_folded[player] else prize - pot_commitment[player]
                     for player in range(player_count)]
 
+        hole_cards = [[CARDS[card_id] for card_id in self._get_hole_card_ids(cards, p)]
+                      for p in range(player_count)]
+        board_cards = [CARDS[card_id] for card_id in self._get_board_card_ids(cards, num_board_cards)]
         winners = HSEval.get_winners(hole_cards, players_folded, board_cards)
         winner_count = len(winners)
         value_per_winner = sum(pot_commitment) / winner_count
         return [value_per_winner - pot_commitment[p] if p in winners else -pot_commitment[p]
                 for p in range(player_count)]
 
-    def _cfr_hole_cards(self, nodes, reach_probs, hole_cards, board_cards, deck, players_folded):
-        num_hole_cards = nodes[0].card_count
-        next_hole_cards = []
-
-        for p in range(self.player_count):
-            next_hole_cards.append(deck.draw_cards(num_hole_cards))
+    def _deal_cards(self, deck=None):
+        """
+        Deals all cards of one game at once as a list of card ids. Hole cards of the players
+        come first in order of players, followed by board cards in order of rounds.
+        """
+        if deck is not None:
+            return [card.to_id() for card in reversed(deck.deck[-self.num_dealt_cards:])]
+        return random.sample(CARD_IDS, self.num_dealt_cards)
 
-        next_nodes = [node.children[self._get_bucket_key(hole_cards=next_hole_cards[p])]
-                      for p, node in enumerate(nodes)]
+    def _get_hole_card_ids(self, cards, player):
+        num_hole_cards = self.game.get_num_hole_cards()
+        return cards[player * num_hole_cards:(player + 1) * num_hole_cards]
 
-        return self._cfr(next_nodes, reach_probs, next_hole_cards, board_cards, copy.deepcopy(deck),
-                         players_folded)
+    def _get_board_card_ids(self, cards, num_board_cards):
+        first_board_card = self.player_count * self.game.get_num_hole_cards()
+        return cards[first_board_card:first_board_card + num_board_cards]
 
-    def _get_bucket_key(self, hole_cards, community_cards=[]):
-        """
-        Calculates 2-card hand evaluation if at 'preflop' street or 5,6,7-card hand evaluation
-        otherwise. Based on the hand value evaluated, returns the correct bucket number it belongs to.
-        """
-        if not community_cards:
-            return HSEval.get_bucket_number(list(map(lambda x: x.__str__(), hole_cards)))
-        else:
-            return HSEval.get_bucket_number(list(map(lambda x: x.__str__(), hole_cards)),
-                                            list(map(lambda x: x.__str__(), community_cards)))
+    def _deal_hole_cards(self, nodes, cards):
+        """ Moves each player to the node of the bucket of their hole cards. """
+        return [node.children[HSEval.get_preflop_bucket(*self._get_hole_card_ids(cards, p))]
+                for p, node in enumerate(nodes)]
 
-    def _cfr_board_cards(self, nodes, reach_probs, hole_cards, board_cards, deck, players_folded):
-        deck = copy.deepcopy(deck)
-        num_board_cards = nodes[0].card_count
-        if any(isinstance(el, list) for el in board_cards):
-            board_cards = [item for sublist in board_cards for item in sublist]
-        new_board_cards = deck.draw_cards(num_board_cards)
-        all_board_cards = board_cards + new_board_cards
+    def _cfr_hole_cards(self, nodes, reach_probs, cards, num_board_cards, players_folded):
+        next_nodes = self._deal_hole_cards(nodes, cards)
 
-        next_nodes = [node.children[self._get_bucket_key(hole_cards=hole_cards[0], 
-                        community_cards=all_board_cards)] for p, node in enumerate(nodes)]
+        return self._cfr(next_nodes, reach_probs, cards, num_board_cards, players_folded)
 
-        return self._cfr(next_nodes, reach_probs, hole_cards, all_board_cards,
-                         deck, players_folded)
+    def _get_board_bucket_keys(self, cards, num_board_cards):
+        """
+        Returns bucket keys of all players with given number of board cards. Keys are computed
+        once per street of the dealt cards, however many times the traversal deals the street.
+        Buckets are looked up in tables of suit-isomorphic hands when they were built by
+        build_bucket_tables.py. Only when the lookup falls back, hands of the players are
+        evaluated incrementally along the streets, so a later street only adds its new board
+        cards to the hands, as streets are first dealt in order of rounds.
+        """
+        if cards is not self._dealt_cards:
+            self._dealt_cards = cards
+            self._dealt_hands = [None] * self.player_count
+            self._dealt_bucket_keys = {}
+
+        bucket_keys = self._dealt_bucket_keys.get(num_board_cards)
+        if bucket_keys is None:
+            board_card_ids = self._get_board_card_ids(cards, num_board_cards)
+            bucket_keys = []
+            for p in range(self.player_count):
+                hole_card_ids = self._get_hole_card_ids(cards, p)
+                bucket = HSEval.get_postflop_bucket(hole_card_ids, board_card_ids)
+                if bucket is None:
+                    hand = self._dealt_hands[p]
+                    if hand is None:
+                        hand = IncrementalEvaluator(HSEval.get_table_evaluator(),
+                                                    HSEval.get_table_card_ids(hole_card_ids + board_card_ids))
+                        self._dealt_hands[p] = hand
+                    else:
+                        hand.add_cards(HSEval.get_table_card_ids(board_card_ids[hand.num_cards - len(hole_card_ids):]))
+                    bucket = HSEval.get_hand_rank_bucket(hand.get_rank())
+                bucket_keys.append(bucket)
+            self._dealt_bucket_keys[num_board_cards] = bucket_keys
+        return bucket_keys
+
+    def _deal_board_cards(self, nodes, cards, num_board_cards):
+        """ Deals next board cards and moves each player to the node of their new bucket. """
+        num_board_cards += nodes[0].card_count
+        bucket_keys = self._get_board_bucket_keys(cards, num_board_cards)
+
+        next_nodes = [node.children[bucket_keys[p]] for p, node in enumerate(nodes)]
+
+        return next_nodes, num_board_cards
+
+    def _cfr_board_cards(self, nodes, reach_probs, cards, num_board_cards, players_folded):
+        next_nodes, num_board_cards = self._deal_board_cards(nodes, cards, num_board_cards)
+
+        return self._cfr(next_nodes, reach_probs, cards, num_board_cards, players_folded)
+
+    def _discount_node(self, node):
+        """
+        Applies DCFR discounts of all iterations since the node was last visited. Regret discounts
+        are the difference of cumulative logarithms of discounts up to the previous iteration and
+        those the node kept at its last visit. Parallel workers run batches of iterations out of
+        order, so a node may already be discounted up to a later iteration. Its last iteration
+        then only moves forward, so no discount is applied twice.
+        """
+        last_iteration = node.last_iteration
+        if last_iteration >= self.iteration:
+            return
+        positive_log, negative_log = self.discount_schedule.get_log_regret_discounts(self.iteration - 1)
+        log_regret_discounts = node.log_regret_discounts
+        if last_iteration > 0:
+            positive_discount = math.exp(positive_log - log_regret_discounts[0])
+            negative_discount = math.exp(negative_log - log_regret_discounts[1])
+            strategy_discount = self.discount_schedule.get_strategy_discount(last_iteration, self.iteration - 1)
+            for a in range(NUM_ACTIONS):
+                node.regret_sum[a] *= positive_discount if node.regret_sum[a] > 0 else negative_discount
+                node.strategy_sum[a] *= strategy_discount
+        log_regret_discounts[0] = positive_log
+        log_regret_discounts[1] = negative_log
+        node.last_iteration = self.iteration
 
     @staticmethod
     def _update_node_strategy(node, realization_weight):
@@ -198,31 +440,33 @@ class Cfr:
                 node.strategy[a] = 0
             node.strategy_sum[a] += realization_weight * node.strategy[a]
 
-    def _cfr_action(self, nodes, reach_probs, hole_cards, board_cards, deck, players_folded):
+    def _cfr_action(self, nodes, reach_probs, cards, num_board_cards, players_folded):
         """ 
         Follows CS3243 game logic requirements for what actions can be taken at the moment.
         Returns the utility values for each player in the game based on utility values generated
         recursively down the game tree.
-        
-        This recursive process can also be achieved using multiple threads, if 'joblib' is installed. 
+
+        With pruning enabled, subtrees of actions with large negative regret are not visited
+        and the regrets of these actions are not updated until the next full iteration.
+
+        Training can be run on multiple processes with cfr_utils.parallel.train_parallel.
         """
         node_player = nodes[0].player
         node = nodes[node_player]
-        Cfr._update_node_strategy(node, reach_probs[node_player])
+        if self.variant == DCFR:
+            self._discount_node(node)
+        strategy_weight = self.iteration if self.variant == CFR_PLUS else 1
+        Cfr._update_node_strategy(node, reach_probs[node_player] * strategy_weight)
         strategy = node.strategy
         util = [None] * NUM_ACTIONS
         node_util = [0] * self.player_count
 
-        try:
-            with joblib.parallel_backend('dask'):
-                jobs_result = Parallel(n_jobs=-1, verbose=100)(delayed(self._cfr_action_process)
-                            (nodes, reach_probs, node_player, hole_cards, board_cards, 
-                            deck, strategy, a, players_folded) for a in node.children)
-        except NameError:
-            jobs_result = []
-            for a in node.children:
-                jobs_result.append(self._cfr_action_process(nodes, reach_probs, node_player, 
-                        hole_cards, board_cards, deck, strategy, a, players_folded))
+        jobs_result = []
+        for a in node.children:
+            if self._is_pruned(node, a):
+                continue
+            jobs_result.append(self._cfr_action_process(nodes, reach_probs, node_player,
+                    cards, num_board_cards, strategy, a, players_folded))
 
         for action, action_util in jobs_result:
             util[action] = action_util
@@ -230,16 +474,20 @@ class Cfr:
                 node_util[player] += strategy[action] * action_util[player]
 
         for a in node.children:
+            if util[a] is None:
+                continue
             regret = util[a][node_player] - node_util[node_player]
 
             opponent_reach_probs = reach_probs[0:node_player] + reach_probs[node_player + 1:]
             reach_prob = reduce(operator.mul, opponent_reach_probs, 1)
             node.regret_sum[a] += regret * reach_prob
+            if self.variant == CFR_PLUS and node.regret_sum[a] < 0:
+                node.regret_sum[a] = 0
 
         return node_util
 
-    def _cfr_action_process(self, nodes, reach_probs, node_player, hole_cards, 
-                            board_cards, deck, strategy, a, players_folded):
+    def _cfr_action_process(self, nodes, reach_probs, node_player, cards,
+                            num_board_cards, strategy, a, players_folded):
         next_reach_probs = list(reach_probs)
         next_reach_probs[node_player] *= strategy[a]
 
@@ -252,6 +500,165 @@ class Cfr:
         """ Recursively calculates cfr """
         action_util = self._cfr(
             [node.children[a] for node in nodes], next_reach_probs,
-            hole_cards, board_cards, deck, next_players_folded)
+            cards, num_board_cards, next_players_folded)
 
         return a, action_util
+
+    def _is_pruned(self, node, action):
+        """ Actions that cannot be played and have regret below threshold are skipped between full iterations """
+        return (self.pruning_threshold is not None
+                and self.iteration % self.pruning_interval != 0
+                and node.strategy[action] == 0
+                and node.regret_sum[action] < self.pruning_threshold)
+
+    @staticmethod
+    def _sample_action(node):
+        """ Samples action of the node from its current strategy. """
+        choice = random.random()
+        probability_sum = 0
+        for a in node.children:
+            probability_sum += node.strategy[a]
+            if choice < probability_sum:
+                return a
+        """ Return the last action since it could have not been selected due to floating point error. """
+        return a
+
+    def _cfr_external(self, nodes, traverser, cards, num_board_cards, players_folded):
+        """
+        External sampling Monte Carlo CFR. Chance was sampled by dealing the cards,
+        the traverser explores all of their actions while only a single action
+        sampled from the current strategy is followed in opponent's nodes.
+        Returns sampled utility of the traversing player.
+        """
+        node = nodes[0]
+        if isinstance(node, TerminalNode):
+            return self._cfr_terminal(nodes, cards, num_board_cards, players_folded)[traverser]
+        elif isinstance(node, HoleCardsNode):
+            next_nodes = self._deal_hole_cards(nodes, cards)
+            return self._cfr_external(next_nodes, traverser, cards, num_board_cards, players_folded)
+        elif isinstance(node, BoardCardsNode):
+            next_nodes, num_board_cards = self._deal_board_cards(nodes, cards, num_board_cards)
+            return self._cfr_external(next_nodes, traverser, cards, num_board_cards, players_folded)
+
+        node_player = node.player
+        node = nodes[node_player]
+        if self.variant == DCFR:
+            self._discount_node(node)
+
+        if node_player != traverser:
+            """ Opponent's average strategy is accumulated here, as it is sampled proportionally to its reach """
+            strategy_weight = self.iteration if self.variant == CFR_PLUS else 1
+            Cfr._update_node_strategy(node, strategy_weight)
+            a = Cfr._sample_action(node)
+            return self._cfr_external(
+                [node.children[a] for node in nodes], traverser,
+                cards, num_board_cards,
+                Cfr._next_players_folded(players_folded, node_player, a))
+
+        Cfr._update_node_strategy(node, 0)
+        strategy = node.strategy
+        util = [None] * NUM_ACTIONS
+        node_util = 0
+        for a in node.children:
+            if self._is_pruned(node, a):
+                continue
+            util[a] = self._cfr_external(
+                [node.children[a] for node in nodes], traverser,
+                cards, num_board_cards,
+                Cfr._next_players_folded(players_folded, node_player, a))
+            node_util += strategy[a] * util[a]
+
+        for a in node.children:
+            if util[a] is None:
+                continue
+            node.regret_sum[a] += util[a] - node_util
+            if self.variant == CFR_PLUS and node.regret_sum[a] < 0:
+                node.regret_sum[a] = 0
+
+        return node_util
+
+    def _cfr_outcome(self, nodes, traverser, cards, num_board_cards, players_folded,
+                     traverser_reach, opponent_reach, sample_reach):
+        """
+        Outcome sampling Monte Carlo CFR. Follows a single trajectory, sampling
+        the traverser's actions from exploration mixed with the current strategy
+        and opponent's actions from the current strategy. Regrets are updated
+        with importance weighted sampled utilities on the way back.
+
+        Returns:
+            (float, float, float): Traverser's utility divided by the probability
+                of sampling the trajectory, probability of playing the rest of
+                the trajectory from this node and the probability of sampling
+                the whole trajectory.
+        """
+        node = nodes[0]
+        if isinstance(node, TerminalNode):
+            utility = self._cfr_terminal(nodes, cards, num_board_cards, players_folded)[traverser]
+            return utility / sample_reach, 1, sample_reach
+        elif isinstance(node, HoleCardsNode):
+            next_nodes = self._deal_hole_cards(nodes, cards)
+            return self._cfr_outcome(next_nodes, traverser, cards, num_board_cards, players_folded,
+                                     traverser_reach, opponent_reach, sample_reach)
+        elif isinstance(node, BoardCardsNode):
+            next_nodes, num_board_cards = self._deal_board_cards(nodes, cards, num_board_cards)
+            return self._cfr_outcome(next_nodes, traverser, cards, num_board_cards, players_folded,
+                                     traverser_reach, opponent_reach, sample_reach)
+
+        node_player = node.player
+        node = nodes[node_player]
+        if self.variant == DCFR:
+            self._discount_node(node)
+
+        Cfr._update_node_strategy(node, 0)
+        strategy = node.strategy
+
+        if node_player == traverser:
+            exploration_probability = self.exploration / len(node.children)
+            sampling_strategy = [exploration_probability + (1 - self.exploration) * strategy[a]
+                                 if a in node.children else 0
+                                 for a in range(NUM_ACTIONS)]
+        else:
+            sampling_strategy = strategy
+
+        choice = random.random()
+        probability_sum = 0
+        for a in node.children:
+            probability_sum += sampling_strategy[a]
+            if choice < probability_sum:
+                break
+
+        next_nodes = [node.children[a] for node in nodes]
+        next_players_folded = Cfr._next_players_folded(players_folded, node_player, a)
+        next_sample_reach = sample_reach * sampling_strategy[a]
+        if node_player == traverser:
+            utility, tail_reach, trajectory_reach = self._cfr_outcome(
+                next_nodes, traverser, cards, num_board_cards, next_players_folded,
+                traverser_reach * strategy[a], opponent_reach, next_sample_reach)
+
+            weighted_utility = utility * opponent_reach
+            for action in node.children:
+                if action == a:
+                    node.regret_sum[action] += weighted_utility * tail_reach * (1 - strategy[a])
+                else:
+                    node.regret_sum[action] -= weighted_utility * tail_reach * strategy[a]
+                if self.variant == CFR_PLUS and node.regret_sum[action] < 0:
+                    node.regret_sum[action] = 0
+        else:
+            utility, tail_reach, trajectory_reach = self._cfr_outcome(
+                next_nodes, traverser, cards, num_board_cards, next_players_folded,
+                traverser_reach, opponent_reach * strategy[a], next_sample_reach)
+
+            """ Stochastically weighted averaging of the opponent's strategy """
+            strategy_weight = self.iteration if self.variant == CFR_PLUS else 1
+            for action in node.children:
+                node.strategy_sum[action] += strategy_weight * opponent_reach * strategy[action] / sample_reach
+
+        return utility, tail_reach * strategy[a], trajectory_reach
+
+    @staticmethod
+    def _next_players_folded(players_folded, node_player, action):
+        if action != FOLD:
+            return players_folded
+        next_players_folded = list(players_folded)
+        next_players_folded[node_player] = True
+        return next_players_folded
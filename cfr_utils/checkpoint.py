@@ -0,0 +1,143 @@
+import json
+import os
+import random
+import threading
+
+import numpy as np
+
+from cfr_utils.array_tree import ArrayGameTree
+from cfr_utils.cfr import Cfr, DiscountSchedule
+
+TREE_STRUCTURE_ARRAYS = ['node_type', 'player', 'card_count', 'parent', 'children', 'pot_commitment']
+TRAINING_STATE_ARRAYS = ['regret_sum', 'strategy_sum', 'last_iteration', 'log_regret_discounts']
+
+
+def _get_checkpoint_arrays(cfr):
+    """Copies complete training state of CFR instance into dictionary of arrays."""
+    tree = cfr.game_tree.tree
+    arrays = {name: np.array(getattr(tree, name)) for name in TREE_STRUCTURE_ARRAYS + TRAINING_STATE_ARRAYS}
+
+    random_version, random_internal_state, random_gauss_next = random.getstate()
+    numpy_state = np.random.get_state()
+    arrays['random_state'] = np.array(random_internal_state, dtype=np.uint32)
+    arrays['numpy_random_keys'] = numpy_state[1]
+
+    metadata = {
+        'iteration': cfr.iteration,
+        'root_id': tree.root_id,
+        'variant': cfr.variant,
+        'sampling': cfr.sampling,
+        'exploration': cfr.exploration,
+        'pruning_threshold': cfr.pruning_threshold,
+        'pruning_interval': cfr.pruning_interval,
+        'discount_schedule': [cfr.discount_schedule.alpha, cfr.discount_schedule.beta,
+                              cfr.discount_schedule.gamma],
+        'random_version': random_version,
+        'random_gauss_next': random_gauss_next,
+        'numpy_random': [numpy_state[0]] + [numpy_state[i] for i in range(2, 5)],
+    }
+    arrays['metadata'] = np.array(json.dumps(metadata))
+    return arrays
+
+
+def _write_checkpoint_arrays(path, arrays):
+    """Writes arrays into temporary file and atomically replaces checkpoint with it."""
+    temporary_path = path + '.tmp'
+    with open(temporary_path, 'wb') as file:
+        np.savez(file, **arrays)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def save_checkpoint(cfr, path):
+    """Writes binary checkpoint of CFR training state.
+
+    The checkpoint contains the array game tree together with regret
+    and strategy sums, iteration count and state of random number generators,
+    so training can continue exactly where it stopped.
+
+    Args:
+        cfr (Cfr): CFR instance with array game tree.
+        path (str): Path of the checkpoint file.
+    """
+    if not cfr.array_tree:
+        raise ValueError('Checkpoints require CFR with array game tree')
+    _write_checkpoint_arrays(path, _get_checkpoint_arrays(cfr))
+
+
+def load_checkpoint(game, path):
+    """Restores CFR instance from checkpoint written by save_checkpoint.
+
+    The game tree is restored from the checkpoint arrays, so it is not rebuilt.
+    Random number generators continue from their state at checkpoint time.
+
+    Args:
+        game (Game): Game definition object the checkpoint was trained for.
+        path (str): Path of the checkpoint file.
+
+    Returns:
+        Cfr: CFR instance with restored training state.
+    """
+    with np.load(path) as data:
+        metadata = json.loads(str(data['metadata']))
+        tree = ArrayGameTree(*[data[name] for name in TREE_STRUCTURE_ARRAYS], root_id=metadata['root_id'])
+        for name in TRAINING_STATE_ARRAYS:
+            setattr(tree, name, data[name])
+        random_state = tuple(int(value) for value in data['random_state'])
+        numpy_random_keys = data['numpy_random_keys']
+
+    if tree.pot_commitment.shape[1] != game.get_num_players():
+        raise ValueError('Checkpoint %s was trained for different game' % path)
+
+    random.setstate((metadata['random_version'], random_state, metadata['random_gauss_next']))
+    bit_generator, position, has_gauss, cached_gaussian = metadata['numpy_random']
+    np.random.set_state((bit_generator, numpy_random_keys, position, has_gauss, cached_gaussian))
+
+    cfr = Cfr(game, array_tree=True, variant=metadata['variant'],
+              discount_schedule=DiscountSchedule(*metadata['discount_schedule']),
+              sampling=metadata['sampling'], exploration=metadata['exploration'],
+              pruning_threshold=metadata['pruning_threshold'], pruning_interval=metadata['pruning_interval'],
+              game_tree=tree.root)
+    cfr.iteration = metadata['iteration']
+    tree.calculate_average_strategy()
+    return cfr
+
+
+class CheckpointWriter:
+    """Writes checkpoints on a background thread so training does not wait for the disk.
+
+    Training state is copied synchronously, which takes only a fraction of
+    a single CFR iteration, and the copy is then written while training
+    continues. If the previous checkpoint is still being written, the next one
+    waits for it, so at most one snapshot is held in memory at once.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._thread = None
+        self._error = None
+
+    def save(self, cfr):
+        """Starts writing checkpoint of current training state of cfr."""
+        self.wait()
+        if not cfr.array_tree:
+            raise ValueError('Checkpoints require CFR with array game tree')
+        arrays = _get_checkpoint_arrays(cfr)
+        self._thread = threading.Thread(target=self._write, args=(arrays,))
+        self._thread.start()
+
+    def _write(self, arrays):
+        try:
+            _write_checkpoint_arrays(self.path, arrays)
+        except Exception as error:
+            self._error = error
+
+    def wait(self):
+        """Waits until the last checkpoint is written and raises error raised while writing it."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
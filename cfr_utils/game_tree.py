@@ -73,3 +73,5 @@ class ActionNode(Node):
         self.strategy = [0] * NUM_ACTIONS
         self.strategy_sum = [0] * NUM_ACTIONS
         self.average_strategy = None
+        self.last_iteration = 0
+        self.log_regret_discounts = [0.0, 0.0]
@@ -1,10 +1,26 @@
 from pypokerengine.engine.hand_evaluator import HandEvaluator
 from pypokerengine.engine.card import Card as PyCard
-from deuces.evaluator import Evaluator as DeucesEvaluator
 from deuces.card import Card as DeucesCard
+from deuces.lookup import LookupTable as DeucesLookupTable
+from cfr_utils.isomorphism import (MAX_BOARD_CARDS, STRENGTH_SCALE, HandTable, get_bucket_table_name,
+                                   get_hand_strength_table_names)
+from cfr_utils.table_evaluator import IncrementalEvaluator, TableEvaluator
 import constants
 import math
 import sys
+import numpy as np
+
+_table_evaluator = None
+_preflop_buckets = None
+_postflop_bucket_tables = {}
+_hand_strength_tables = {}
+
+""" pypokerengine card id of card strings such as 'CA' """
+_CARD_IDS = {str(PyCard.from_id(card_id)): card_id for card_id in range(1, 53)}
+
+""" Card id 0..51 used by bucket tables (see isomorphism) of pypokerengine card id """
+_TABLE_CARD_IDS = [None] + [(PyCard.from_id(card_id).rank - 2) * 4 + sorted(PyCard.SUIT_MAP).index(PyCard.from_id(card_id).suit)
+                            for card_id in range(1, 53)]
 
 
 def get_winners(players_hole, players_folded, community_cards):
@@ -25,30 +41,195 @@ def get_winners(players_hole, players_folded, community_cards):
     winners = [i for i, score in enumerate(valid_scores) if score >= best_score]
     return winners
 
+def get_table_evaluator():
+	"""
+	Returns table based 7-card evaluator shared by the whole process.
+	It gives the same hand ranks as Deuces evaluator.
+	"""
+	global _table_evaluator
+	if _table_evaluator is None:
+		_table_evaluator = TableEvaluator()
+	return _table_evaluator
+
+def get_starting_hand_class(card_id1, card_id2):
+	"""
+	Returns index 0..168 of suit-isomorphic class of two hole cards given by pypokerengine card ids.
+	Classes form 13x13 matrix of ranks, pairs on the diagonal, suited hands above and offsuit below it.
+	"""
+	card1 = PyCard.from_id(card_id1)
+	card2 = PyCard.from_id(card_id2)
+	high_rank, low_rank = max(card1.rank, card2.rank) - 2, min(card1.rank, card2.rank) - 2
+	if card1.suit == card2.suit:
+		return low_rank * 13 + high_rank
+	return high_rank * 13 + low_rank
+
+def _get_chen_bucket(hole_cards):
+	points = starting_hand_evaluator(hole_cards)
+	bucket_number = int(math.ceil((points + 1.5) / 21.5 * constants.BUCKET_NUM) - 1)
+	return 0 if bucket_number == -1 else bucket_number
+
+def _build_preflop_buckets():
+	""" Chen's formula is evaluated once for each of the 169 starting hand classes. """
+	class_buckets = {}
+	buckets = np.zeros((53, 53), dtype=np.int8)
+	for card_id1 in range(1, 53):
+		for card_id2 in range(1, 53):
+			if card_id1 == card_id2:
+				continue
+			hand_class = get_starting_hand_class(card_id1, card_id2)
+			if hand_class not in class_buckets:
+				class_buckets[hand_class] = _get_chen_bucket([str(PyCard.from_id(card_id1)), str(PyCard.from_id(card_id2))])
+			buckets[card_id1, card_id2] = class_buckets[hand_class]
+	return buckets
+
+def get_preflop_bucket(card_id1, card_id2):
+	"""
+	Returns preflop bucket of two hole cards given by pypokerengine card ids
+	from the table of all 1326 hole card combinations, built once per process.
+	"""
+	global _preflop_buckets
+	if _preflop_buckets is None or _preflop_buckets[0] != constants.BUCKET_NUM:
+		_preflop_buckets = (constants.BUCKET_NUM, _build_preflop_buckets().tolist())
+	return _preflop_buckets[1][card_id1][card_id2]
+
+def get_postflop_bucket_table(num_board_cards):
+	"""
+	Returns bucket table of all hands with given number of board cards built by build_bucket_tables.py
+	for the current number of buckets and bucketing scheme, or None when it was not built.
+	"""
+	key = (num_board_cards, constants.BUCKET_NUM, constants.BUCKETING)
+	if key not in _postflop_bucket_tables:
+		_postflop_bucket_tables[key] = HandTable.load(num_board_cards, get_bucket_table_name(*key))
+	return _postflop_bucket_tables[key]
+
+def get_hand_strength_table(num_board_cards):
+	"""
+	Returns table of E[HS] or E[HS^2] of all hands with given number of board cards for the current
+	bucketing scheme built by build_hand_strength_tables.py, or None when it was not built.
+	"""
+	key = (num_board_cards, constants.BUCKETING)
+	if key not in _hand_strength_tables:
+		ehs_name, ehs2_name = get_hand_strength_table_names(num_board_cards)
+		name = ehs2_name if constants.BUCKETING == constants.EHS2_BUCKETING else ehs_name
+		_hand_strength_tables[key] = HandTable.load(num_board_cards, name)
+	return _hand_strength_tables[key]
+
+def get_table_card_ids(card_ids):
+	""" Returns card ids 0..51 of table evaluation (see isomorphism) of pypokerengine card ids. """
+	return [_TABLE_CARD_IDS[card_id] for card_id in card_ids]
+
+def get_strength_bucket(strength):
+	""" Divides strength 0..1 into BUCKET_NUM buckets of equal width. """
+	bucket_number = int(math.ceil(strength * constants.BUCKET_NUM) - 1)
+	return 0 if bucket_number == -1 else bucket_number
+
+def get_hand_rank_bucket(hand_rank):
+	""" Hand rank bucketing of Deuces rank of 5 to 7 card hand, strength is 1 for the best hand. """
+	return get_strength_bucket(1.0 - hand_rank / float(DeucesLookupTable.MAX_HIGH_CARD))
+
+def get_postflop_bucket(hole_card_ids, board_card_ids):
+	"""
+	Returns bucket of hole and board cards given by pypokerengine card ids looked up by their
+	suit-isomorphic index. Without bucket table, hand rank bucketing returns None as hands are
+	evaluated, while E[HS] and E[HS^2] bucketing look up the strength in hand strength tables.
+	K-means buckets exist only as bucket tables.
+	"""
+	hole_card_ids = get_table_card_ids(hole_card_ids)
+	board_card_ids = get_table_card_ids(board_card_ids)
+	table = get_postflop_bucket_table(len(board_card_ids))
+	if table is not None:
+		return table.get_value(hole_card_ids, board_card_ids)
+	if constants.BUCKETING == constants.HAND_RANK_BUCKETING:
+		return None
+	if constants.BUCKETING == constants.KMEANS_BUCKETING:
+		raise ValueError('K-means bucketing requires bucket tables built by build_bucket_tables.py')
+
+	strength_table = get_hand_strength_table(len(board_card_ids))
+	if strength_table is None:
+		raise ValueError('%s bucketing requires hand strength tables built by build_hand_strength_tables.py'
+						 % constants.BUCKETING)
+	return get_strength_bucket(strength_table.get_value(hole_card_ids, board_card_ids) / float(STRENGTH_SCALE))
+
+def load_tables():
+	"""
+	Loads the evaluator, the preflop buckets and the postflop bucket or hand strength tables
+	of the current bucketing scheme, building the evaluator and preflop tables when they
+	were not stored yet. Agents call it once when created, so their decisions never wait
+	for tables to be built or loaded.
+	"""
+	get_table_evaluator()
+	get_preflop_bucket(1, 2)
+	for num_board_cards in range(3, MAX_BOARD_CARDS + 1):
+		if get_postflop_bucket_table(num_board_cards) is None and constants.BUCKETING != constants.HAND_RANK_BUCKETING:
+			get_hand_strength_table(num_board_cards)
+
 def get_bucket_number(hole_cards, community_cards = None):
 	"""	
 	Evaluate handstrength base on Chen's Formula if only hole cards are drawn,
     because it values both hand potential as well as relative value of card rank.
-    Otherwise, evaluate handstrength using Deuces Monte-carlo Look-up table.
+    Otherwise, evaluate handstrength using Deuces Monte-carlo Look-up table, or use
+    expected hand strength E[HS], E[HS^2] or k-means clusters of equity distributions
+    depending on constants.BUCKETING.
     Divide the bucket with equal probability based on the number of buckets.
     Using the handstrength value drawn earlier, find the right bucket.
+    Preflop buckets are looked up in table precomputed for all hole cards and postflop
+    buckets in tables of suit-isomorphic hands when they were built.
     
     :param hole_cards: List(str) in format of 'CA' for hole cards belong to the current player
     :param community_cards: List(str) in format of 'S3' for community cards   
     """
 	if not community_cards:
-		points = starting_hand_evaluator(hole_cards)
-		bucket_number = int(math.ceil((points + 1.5) / 21.5 * constants.BUCKET_NUM) - 1)
+		return get_preflop_bucket(_CARD_IDS[hole_cards[0]], _CARD_IDS[hole_cards[1]])
 	else:
+		bucket_number = get_postflop_bucket([_CARD_IDS[card] for card in hole_cards],
+											[_CARD_IDS[card] for card in community_cards])
+		if bucket_number is not None:
+			return bucket_number
+
 		hole_cards = list(map(lambda x : DeucesCard.new(x[1] + x[0].lower()), hole_cards))
 		community_cards = list(map(lambda x : DeucesCard.new(x[1] + x[0].lower()), community_cards))
 
-		evaluator = DeucesEvaluator()
-		five_cards_ranking = evaluator.evaluate(hole_cards, community_cards)
-		strength = 1.0 - evaluator.get_five_card_rank_percentage(five_cards_ranking)
-		bucket_number = int(math.ceil(strength * constants.BUCKET_NUM) - 1)
-  
-	return 0 if bucket_number == -1 else bucket_number
+		return get_hand_rank_bucket(get_table_evaluator().evaluate(hole_cards, community_cards))
+
+class HandBuckets:
+	"""
+	Bucket numbers of the hole cards of one hand on each street, same as get_bucket_number.
+	Community cards are added to an IncrementalEvaluator as the streets are dealt, so a new
+	street evaluates only its new cards, and buckets of streets seen before are kept.
+	Community cards not continuing the cards seen before start the evaluation over.
+	
+	:param hole_cards: List(str) in format of 'CA' for hole cards belong to the current player
+	"""
+
+	def __init__(self, hole_cards):
+		self.hole_cards = list(hole_cards)
+		self.hole_card_ids = [_CARD_IDS[card] for card in hole_cards]
+		self._start_hand()
+
+	def _start_hand(self):
+		self.community_card_ids = []
+		self.hand = IncrementalEvaluator(get_table_evaluator(), get_table_card_ids(self.hole_card_ids))
+		self.buckets = {0: get_preflop_bucket(*self.hole_card_ids)}
+
+	def get_bucket(self, community_cards = None):
+		"""
+		:param community_cards: List(str) in format of 'S3' for community cards
+		"""
+		community_card_ids = [_CARD_IDS[card] for card in community_cards or []]
+		num_cards = len(community_card_ids)
+		bucket_number = self.buckets.get(num_cards)
+		if bucket_number is not None and community_card_ids == self.community_card_ids[:num_cards]:
+			return bucket_number
+
+		if community_card_ids[:len(self.community_card_ids)] != self.community_card_ids:
+			self._start_hand()
+		self.hand.add_cards(get_table_card_ids(community_card_ids[len(self.community_card_ids):]))
+		self.community_card_ids = community_card_ids
+		bucket_number = get_postflop_bucket(self.hole_card_ids, community_card_ids)
+		if bucket_number is None:
+			bucket_number = get_hand_rank_bucket(self.hand.get_rank())
+		self.buckets[num_cards] = bucket_number
+		return bucket_number
 
 def starting_hand_evaluator(hole_cards):
 
@@ -0,0 +1,197 @@
+import multiprocessing
+from math import comb
+
+import numpy as np
+
+from cfr_utils.isomorphism import (HOLE_CARD_IDS, MAX_BOARD_CARDS, NUM_CARDS, NUM_HOLE_COMBINATIONS, STRENGTH_SCALE,
+                                   canonicalize_boards, enumerate_board_classes, get_board_classes_name,
+                                   get_hand_strength_table_names, get_hole_indices)
+from cfr_utils.parallel import share_array
+from cfr_utils.table_evaluator import INVALID_RANK, TableEvaluator
+from cfr_utils.table_store import load_table
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
+
+"""Hole card combinations (52, 51) containing each card"""
+CARD_HOLES = np.array([np.nonzero((HOLE_CARD_IDS == card_id).any(axis=1))[0] for card_id in range(NUM_CARDS)])
+
+"""Positions of both cards of each hole card combination in flattened CARD_HOLES"""
+HOLE_POSITIONS = np.array([[card_id * (NUM_CARDS - 1) + np.searchsorted(CARD_HOLES[card_id], hole_index)
+                            for card_id in HOLE_CARD_IDS[hole_index]]
+                           for hole_index in range(NUM_HOLE_COMBINATIONS)])
+
+HOLE_MASKS = np.left_shift(1, HOLE_CARD_IDS.astype(np.int64)).sum(axis=1)
+
+_worker_state = None
+
+
+def get_river_hand_strength(evaluator, boards):
+    """Returns hand strength of all hole cards on complete boards.
+
+    Hand strength is the probability of winning against uniformly random
+    hole cards of the opponent, counting ties as half. Hands are ranked once per
+    board. The number of worse and tied opponent hands is counted from a histogram
+    of ranks, and hands sharing a card with the hole cards are subtracted,
+    which are the hands containing one of its cards.
+
+    Args:
+        evaluator (TableEvaluator): Evaluator ranking the hands.
+        boards (np.ndarray): Card ids (N, 5) of boards.
+
+    Returns:
+        np.ndarray: Hand strength (N, 1326) of hole card combinations, 0 for hole cards on the board.
+    """
+    num_boards = len(boards)
+    board_masks = np.left_shift(1, boards.astype(np.int64)).sum(axis=1)
+    valid = (board_masks[:, np.newaxis] & HOLE_MASKS[np.newaxis, :]) == 0
+    board_indices, hole_indices = np.nonzero(valid)
+
+    """ Rank 0 of invalid hole cards is better than all hands, so they are never counted as worse or tied """
+    ranks = np.zeros((num_boards, NUM_HOLE_COMBINATIONS), dtype=np.int64)
+    ranks[board_indices, hole_indices] = evaluator.evaluate_batch(
+        np.column_stack([HOLE_CARD_IDS[hole_indices], boards[board_indices]]))
+
+    rows = np.arange(num_boards)[:, np.newaxis]
+    rank_counts = np.bincount((ranks + rows * (INVALID_RANK + 1)).reshape(-1),
+                              minlength=num_boards * (INVALID_RANK + 1)).reshape(num_boards, -1)
+    worse = NUM_HOLE_COMBINATIONS - np.cumsum(rank_counts, axis=1)[rows, ranks]
+    tied = rank_counts[rows, ranks]
+
+    card_ranks = ranks[:, CARD_HOLES]
+    card_worse = (card_ranks[:, :, np.newaxis, :] > card_ranks[:, :, :, np.newaxis]).sum(axis=3).reshape(num_boards, -1)
+    card_tied = (card_ranks[:, :, np.newaxis, :] == card_ranks[:, :, :, np.newaxis]).sum(axis=3).reshape(num_boards, -1)
+
+    """ Hole cards themselves are tied and contain both cards, so they are subtracted once too many """
+    worse -= card_worse[:, HOLE_POSITIONS[:, 0]] + card_worse[:, HOLE_POSITIONS[:, 1]]
+    tied -= card_tied[:, HOLE_POSITIONS[:, 0]] + card_tied[:, HOLE_POSITIONS[:, 1]] - 1
+
+    num_opponent_holes = comb(NUM_CARDS - MAX_BOARD_CARDS - 2, 2)
+    return np.where(valid, (worse + 0.5 * tied) / num_opponent_holes, 0.0)
+
+
+def get_next_values(boards, next_board_class_keys, next_values):
+    """Returns values of all hole cards after each next board card.
+
+    Args:
+        boards (np.ndarray): Card ids (N, num_board_cards) of boards.
+        next_board_class_keys (np.ndarray): Sorted keys of board classes with one more card.
+        next_values (np.ndarray): Values of hands with one more board card indexed
+                                  by suit-isomorphic hand index.
+
+    Returns:
+        (np.ndarray, np.ndarray): Values (N, 52 - num_board_cards, 1326) after each card
+            not on the board and whether the hole cards do not contain the board or the next card.
+    """
+    num_boards, num_board_cards = boards.shape
+    board_masks = np.left_shift(1, boards.astype(np.int64)).sum(axis=1)
+    next_cards = np.array([[card_id for card_id in range(NUM_CARDS) if not board_mask >> card_id & 1]
+                           for board_mask in board_masks.tolist()])
+    next_boards = np.concatenate([np.repeat(boards, next_cards.shape[1], axis=0),
+                                  next_cards.reshape(-1, 1)], axis=1)
+
+    keys, canonical_suits = canonicalize_boards(next_boards)
+    board_classes = np.searchsorted(next_board_class_keys, keys)
+    hole_card_ids = HOLE_CARD_IDS[np.newaxis, :, :]
+    canonical_holes = (hole_card_ids & ~3) | np.take_along_axis(
+        canonical_suits[:, np.newaxis, :], hole_card_ids & 3, axis=2)
+    hole_indices = get_hole_indices(canonical_holes[:, :, 0], canonical_holes[:, :, 1])
+    values = np.asarray(next_values[board_classes[:, np.newaxis] * NUM_HOLE_COMBINATIONS + hole_indices],
+                        dtype=np.float64)
+
+    next_board_masks = np.left_shift(1, next_boards.astype(np.int64)).sum(axis=1)
+    valid = (next_board_masks[:, np.newaxis] & HOLE_MASKS[np.newaxis, :]) == 0
+    return (values.reshape(num_boards, -1, NUM_HOLE_COMBINATIONS),
+            valid.reshape(num_boards, -1, NUM_HOLE_COMBINATIONS))
+
+
+def get_expected_values(boards, next_board_class_keys, next_values):
+    """Returns mean values (N, 1326) of all hole cards over the next board card not among
+    the hole and board cards, 0 for hole cards on the board. See get_next_values."""
+    values, valid = get_next_values(boards, next_board_class_keys, next_values)
+    num_next_cards = NUM_CARDS - boards.shape[1] - 2
+    return np.where(valid, values, 0.0).sum(axis=1) / num_next_cards
+
+
+def _fill_tables(start):
+    """Computes hand strengths of a chunk of canonical boards into the shared output tables."""
+    boards, chunk_size, evaluator, next_tables, outputs = _worker_state
+    chunk = boards[start:start + chunk_size]
+    if next_tables is None:
+        hand_strength = get_river_hand_strength(evaluator, chunk)
+        strengths = [hand_strength, hand_strength ** 2]
+    else:
+        next_board_class_keys, next_strength_tables = next_tables
+        strengths = [get_expected_values(chunk, next_board_class_keys, table) / STRENGTH_SCALE
+                     for table in next_strength_tables]
+
+    for output, strength in zip(outputs, strengths):
+        output[start * NUM_HOLE_COMBINATIONS:(start + len(chunk)) * NUM_HOLE_COMBINATIONS] = \
+            np.rint(strength * STRENGTH_SCALE).reshape(-1)
+    return len(chunk)
+
+
+def build_hand_strength_tables(num_board_cards, workers, chunk_size=100, show_progress=True):
+    """Computes expected hand strength E[HS] and its square E[HS^2] of all suit-isomorphic hands.
+
+    River hand strengths are computed exactly against all opponent hole cards.
+    Earlier streets average the stored values of the next street over the next
+    board card, so tables must be built from the river back to the flop.
+    Canonical boards are split into chunks computed by forked worker processes,
+    which write into output tables in shared memory.
+
+    Args:
+        num_board_cards (int): Number of board cards, 3 to 5.
+        workers (int): Number of worker processes.
+        chunk_size (int): Number of canonical boards a worker computes at once.
+        show_progress (bool): Show progress bar.
+
+    Returns:
+        (np.ndarray, np.ndarray, np.ndarray): Sorted board class keys, expected hand strength
+            and expected squared hand strength tables indexed by suit-isomorphic hand index.
+    """
+    global _worker_state
+    board_class_keys, boards = enumerate_board_classes(num_board_cards)
+
+    evaluator = None
+    next_tables = None
+    if num_board_cards == MAX_BOARD_CARDS:
+        evaluator = TableEvaluator()
+    else:
+        next_board_class_keys = load_table(get_board_classes_name(num_board_cards + 1))
+        next_strength_tables = [load_table(name) for name in get_hand_strength_table_names(num_board_cards + 1)]
+        if next_board_class_keys is None or any(table is None for table in next_strength_tables):
+            raise ValueError('Hand strength tables of %s board cards must be built first' % (num_board_cards + 1))
+        next_tables = (np.array(next_board_class_keys), next_strength_tables)
+
+    outputs = [share_array(np.zeros(len(boards) * NUM_HOLE_COMBINATIONS, dtype=np.uint16)) for i in range(2)]
+    _worker_state = (boards, chunk_size, evaluator, next_tables, outputs)
+
+    progress = None
+    if show_progress:
+        try:
+            progress = tqdm(total=len(boards))
+            progress.set_description('Hand strength of %s card boards' % num_board_cards)
+        except NameError:
+            pass
+
+    starts = range(0, len(boards), chunk_size)
+    if workers > 1:
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        chunk_sizes = pool.imap_unordered(_fill_tables, starts)
+    else:
+        pool = None
+        chunk_sizes = map(_fill_tables, starts)
+    for computed_boards in chunk_sizes:
+        if progress is not None:
+            progress.update(computed_boards)
+    if pool is not None:
+        pool.close()
+        pool.join()
+    if progress is not None:
+        progress.close()
+
+    _worker_state = None
+    return board_class_keys, outputs[0], outputs[1]
@@ -0,0 +1,144 @@
+import itertools
+
+import numpy as np
+
+from cfr_utils.table_store import load_table
+
+"""Cards are identified by ids 0..51 equal to rank * 4 + suit, as in table_evaluator."""
+NUM_CARDS = 52
+NUM_SUITS = 4
+NUM_HOLE_COMBINATIONS = 1326
+MAX_BOARD_CARDS = 5
+
+"""Hand strengths 0..1 are stored as unsigned 16 bit fixed point numbers"""
+STRENGTH_SCALE = 65535
+
+""" Card ids (1326, 2) of hole card combinations, ordered by their index get_hole_index """
+HOLE_CARD_IDS = np.array([(low, high) for high in range(NUM_CARDS) for low in range(high)], dtype=np.int32)
+
+
+def get_hole_index(card_id1, card_id2):
+    """Returns index 0..1325 of two different hole cards."""
+    low, high = min(card_id1, card_id2), max(card_id1, card_id2)
+    return high * (high - 1) // 2 + low
+
+
+def canonicalize(hole_card_ids, board_card_ids):
+    """Maps hole and board cards to their suit-isomorphic representative.
+
+    Suits are relabeled so that suit masks of board ranks are in descending order.
+    Two boards are suit isomorphic exactly when their sorted masks are equal,
+    so the key of sorted masks identifies the board class. Hole cards are
+    relabeled by the same permutation of suits.
+
+    Returns:
+        (int, int): Key of the board class and index of relabeled hole cards.
+    """
+    suit_masks = [0] * NUM_SUITS
+    for card_id in board_card_ids:
+        suit_masks[card_id & 3] |= 1 << (card_id >> 2)
+
+    """ Stable sort, ties between suits with equal masks are broken by suit """
+    suit_order = sorted(range(NUM_SUITS), key=suit_masks.__getitem__, reverse=True)
+    canonical_suits = [0] * NUM_SUITS
+    key = 0
+    for canonical_suit, suit in enumerate(suit_order):
+        canonical_suits[suit] = canonical_suit
+        key = key << 13 | suit_masks[suit]
+
+    card_id1, card_id2 = hole_card_ids
+    return key, get_hole_index((card_id1 & ~3) | canonical_suits[card_id1 & 3],
+                               (card_id2 & ~3) | canonical_suits[card_id2 & 3])
+
+
+def canonicalize_boards(board_card_ids):
+    """Vectorized canonicalization of boards, relabeling suits exactly like canonicalize.
+
+    Args:
+        board_card_ids (np.ndarray): Integer array (N, num_board_cards) of card ids.
+
+    Returns:
+        (np.ndarray, np.ndarray): Keys (N,) of board classes and canonical suits (N, 4)
+            of original suits, which relabel cards of each hand.
+    """
+    board_card_ids = np.asarray(board_card_ids, dtype=np.int64)
+    suit_masks = np.zeros((len(board_card_ids), NUM_SUITS), dtype=np.int64)
+    for suit in range(NUM_SUITS):
+        suit_masks[:, suit] = np.where((board_card_ids & 3) == suit, np.left_shift(1, board_card_ids >> 2), 0).sum(axis=1)
+
+    suit_order = np.argsort(-suit_masks, axis=1, kind='stable')
+    sorted_masks = np.take_along_axis(suit_masks, suit_order, axis=1)
+    keys = np.zeros(len(board_card_ids), dtype=np.int64)
+    for canonical_suit in range(NUM_SUITS):
+        keys = keys << 13 | sorted_masks[:, canonical_suit]
+
+    canonical_suits = np.empty_like(suit_order)
+    np.put_along_axis(canonical_suits, suit_order, np.arange(NUM_SUITS)[np.newaxis, :], axis=1)
+    return keys, canonical_suits
+
+
+def get_hole_indices(card_ids1, card_ids2):
+    """Vectorized get_hole_index."""
+    low, high = np.minimum(card_ids1, card_ids2), np.maximum(card_ids1, card_ids2)
+    return high * (high - 1) // 2 + low
+
+
+def enumerate_board_classes(num_board_cards):
+    """Finds all suit-isomorphic classes of boards with given number of cards.
+
+    Returns:
+        (np.ndarray, np.ndarray): Sorted keys (num_classes,) of board classes
+            and card ids (num_classes, num_board_cards) of their canonical boards.
+    """
+    boards = np.fromiter(itertools.chain.from_iterable(itertools.combinations(range(NUM_CARDS), num_board_cards)),
+                         dtype=np.int64).reshape(-1, num_board_cards)
+    keys, canonical_suits = canonicalize_boards(boards)
+    keys, first_boards = np.unique(keys, return_index=True)
+
+    boards = boards[first_boards]
+    canonical_boards = (boards & ~3) | np.take_along_axis(canonical_suits[first_boards], boards & 3, axis=1)
+    return keys, np.sort(canonical_boards, axis=1).astype(np.int32)
+
+
+def get_board_classes_name(num_board_cards):
+    """Returns name of stored table of board class keys."""
+    return 'board_classes_%s' % num_board_cards
+
+
+def get_hand_strength_table_names(num_board_cards):
+    """Returns names of stored tables of expected hand strength and expected squared hand strength."""
+    return ('expected_hand_strength_%s' % num_board_cards,
+            'expected_hand_strength_squared_%s' % num_board_cards)
+
+
+def get_bucket_table_name(num_board_cards, bucket_num, bucketing):
+    """Returns name of stored table of bucket numbers of given bucketing scheme."""
+    return 'postflop_buckets_%s_%s_%s' % (bucketing, num_board_cards, bucket_num)
+
+
+class HandTable:
+    """Values of all hands of a street indexed by suit-isomorphic hand index.
+
+    Values are stored in a dense array of num_board_classes * 1326 entries, where
+    entry board_class * 1326 + hole_index is the value of relabeled hole cards
+    with the canonical board of the class. Tables such as bucket numbers
+    are built offline by build_bucket_tables.py and memory-mapped.
+    """
+
+    def __init__(self, board_class_keys, values):
+        self.board_classes = {key: board_class for board_class, key in enumerate(board_class_keys.tolist())}
+        self.values = memoryview(values)
+
+    @staticmethod
+    def load(num_board_cards, name):
+        """Returns stored table of given name, or None when it was not built yet."""
+        board_class_keys = load_table(get_board_classes_name(num_board_cards))
+        values = load_table(name)
+        if board_class_keys is None or values is None:
+            return None
+        return HandTable(board_class_keys, values)
+
+    def get_value(self, hole_card_ids, board_card_ids):
+        key, hole_index = canonicalize(hole_card_ids, board_card_ids)
+        return self.values[self.board_classes[key] * NUM_HOLE_COMBINATIONS + hole_index]
+
@@ -0,0 +1,171 @@
+import numpy as np
+
+from cfr_utils.hand_strength import HOLE_MASKS, get_next_values
+from cfr_utils.isomorphism import (MAX_BOARD_CARDS, NUM_CARDS, NUM_HOLE_COMBINATIONS, STRENGTH_SCALE,
+                                   canonicalize_boards, enumerate_board_classes, get_board_classes_name,
+                                   get_hand_strength_table_names)
+from cfr_utils.table_store import load_table
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
+
+NUM_HISTOGRAM_BINS = 30
+
+
+class EquityHistograms:
+    """Equity distributions of all hole cards on canonical boards of a street.
+
+    The distribution of a hand is the histogram of its expected hand strength
+    after each possible next board card, so hands with the same E[HS] but
+    different potential get different histograms. On the river it is the
+    hand strength itself. Histograms are returned as cumulative distributions,
+    whose squared Euclidean distance is a fast stand-in for the earth mover's
+    distance, which is the L1 distance of cumulative distributions in one dimension.
+    """
+
+    def __init__(self, num_board_cards):
+        self.board_class_keys, self.boards = enumerate_board_classes(num_board_cards)
+        self.next_board_class_keys = None
+        street_board_cards = num_board_cards
+        if num_board_cards < MAX_BOARD_CARDS:
+            street_board_cards = num_board_cards + 1
+        board_class_keys = load_table(get_board_classes_name(street_board_cards))
+        self.strengths = load_table(get_hand_strength_table_names(street_board_cards)[0])
+        if board_class_keys is None or self.strengths is None:
+            raise ValueError('K-means bucketing requires hand strength tables built by build_hand_strength_tables.py')
+        if num_board_cards < MAX_BOARD_CARDS:
+            self.next_board_class_keys = np.array(board_class_keys)
+
+    def get_num_board_classes(self):
+        return len(self.boards)
+
+    def sample_board_classes(self, num_boards):
+        """Returns board classes of uniformly random boards, so classes are sampled by their probability."""
+        num_board_cards = self.boards.shape[1]
+        boards = np.argsort(np.random.rand(num_boards, NUM_CARDS), axis=1)[:, :num_board_cards]
+        return np.searchsorted(self.board_class_keys, canonicalize_boards(boards)[0])
+
+    def get_histograms(self, board_classes):
+        """Returns cumulative equity histograms (N * 1326, NUM_HISTOGRAM_BINS) of all hole cards
+        on canonical boards of given classes and whether the hole cards are not on the board."""
+        boards = self.boards[board_classes]
+        if self.next_board_class_keys is None:
+            indices = board_classes[:, np.newaxis] * NUM_HOLE_COMBINATIONS + np.arange(NUM_HOLE_COMBINATIONS)
+            values = np.asarray(self.strengths[indices], dtype=np.float64)[:, np.newaxis, :]
+            board_masks = np.left_shift(1, boards.astype(np.int64)).sum(axis=1)
+            valid = ((board_masks[:, np.newaxis] & HOLE_MASKS[np.newaxis, :]) == 0)[:, np.newaxis, :]
+        else:
+            values, valid = get_next_values(boards, self.next_board_class_keys, self.strengths)
+
+        bins = np.minimum((values * (NUM_HISTOGRAM_BINS / float(STRENGTH_SCALE))).astype(np.int64),
+                          NUM_HISTOGRAM_BINS - 1)
+        hands = np.arange(len(boards) * NUM_HOLE_COMBINATIONS).reshape(len(boards), 1, NUM_HOLE_COMBINATIONS)
+        histograms = np.bincount((hands * NUM_HISTOGRAM_BINS + bins)[valid],
+                                 minlength=hands.size * NUM_HISTOGRAM_BINS).reshape(-1, NUM_HISTOGRAM_BINS)
+        counts = histograms.sum(axis=1)
+        return np.cumsum(histograms, axis=1) / np.maximum(counts, 1)[:, np.newaxis], counts > 0
+
+
+def _get_squared_distances(points, centers):
+    return ((points ** 2).sum(axis=1)[:, np.newaxis] - 2 * points.dot(centers.T)
+            + (centers ** 2).sum(axis=1)[np.newaxis, :])
+
+
+def _init_centers(points, num_clusters):
+    """Chooses initial centers from points by k-means++ seeding."""
+    centers = [points[np.random.randint(len(points))]]
+    distances = _get_squared_distances(points, np.array(centers))[:, 0]
+    for i in range(1, num_clusters):
+        probabilities = np.maximum(distances, 0)
+        if probabilities.sum() > 0:
+            center = points[np.random.choice(len(points), p=probabilities / probabilities.sum())]
+        else:
+            center = points[np.random.randint(len(points))]
+        centers.append(center)
+        distances = np.minimum(distances, _get_squared_distances(points, center[np.newaxis, :])[:, 0])
+    return np.array(centers)
+
+
+def fit_centers(histograms, num_clusters, num_batches, boards_per_batch, show_progress=True):
+    """Clusters equity histograms of randomly dealt hands by mini-batch k-means.
+
+    Each batch takes all hole cards of a few random boards. Every center moves
+    towards the mean of its points in the batch with learning rate falling
+    with the number of points it was assigned so far, so the centers converge
+    without ever holding histograms of all hands in memory.
+
+    Args:
+        histograms (EquityHistograms): Histograms of the street.
+        num_clusters (int): Number of clusters.
+        num_batches (int): Number of mini-batches.
+        boards_per_batch (int): Number of random boards of a mini-batch.
+        show_progress (bool): Show progress bar.
+
+    Returns:
+        np.ndarray: Centers (num_clusters, NUM_HISTOGRAM_BINS) ordered from the weakest
+                    hands, which have the largest cumulative distribution.
+    """
+    points, valid = histograms.get_histograms(histograms.sample_board_classes(boards_per_batch))
+    centers = _init_centers(points[valid], num_clusters)
+    center_counts = np.zeros(num_clusters)
+
+    batches_iterable = range(num_batches)
+    if show_progress:
+        try:
+            batches_iterable = tqdm(batches_iterable)
+            batches_iterable.set_description('K-means on %s card boards' % histograms.boards.shape[1])
+        except NameError:
+            pass
+
+    for i in batches_iterable:
+        points, valid = histograms.get_histograms(histograms.sample_board_classes(boards_per_batch))
+        points = points[valid]
+        labels = np.argmin(_get_squared_distances(points, centers), axis=1)
+        label_counts = np.bincount(labels, minlength=num_clusters)
+        label_sums = np.zeros_like(centers)
+        np.add.at(label_sums, labels, points)
+        center_counts += label_counts
+        centers += (label_sums - label_counts[:, np.newaxis] * centers) / np.maximum(center_counts, 1)[:, np.newaxis]
+
+    return centers[np.argsort(-centers.sum(axis=1), kind='stable')]
+
+
+def build_kmeans_bucket_table(num_board_cards, bucket_num, num_batches, boards_per_batch, batch_size=100,
+                              show_progress=True):
+    """Builds potential-aware buckets of all suit-isomorphic hands by k-means on equity histograms.
+
+    Args:
+        num_board_cards (int): Number of board cards, 3 to 5.
+        bucket_num (int): Number of buckets, which is the number of clusters.
+        num_batches (int): Number of k-means mini-batches.
+        boards_per_batch (int): Number of random boards of a mini-batch.
+        batch_size (int): Number of canonical boards whose hands are assigned to buckets at once.
+        show_progress (bool): Show progress bar.
+
+    Returns:
+        (np.ndarray, np.ndarray): Sorted board class keys and bucket numbers indexed
+            by suit-isomorphic hand index, 0 for hole cards on the board.
+    """
+    histograms = EquityHistograms(num_board_cards)
+    centers = fit_centers(histograms, bucket_num, num_batches, boards_per_batch, show_progress)
+
+    num_board_classes = histograms.get_num_board_classes()
+    buckets = np.zeros(num_board_classes * NUM_HOLE_COMBINATIONS, dtype=np.int8)
+    batches_iterable = range(0, num_board_classes, batch_size)
+    if show_progress:
+        try:
+            batches_iterable = tqdm(batches_iterable)
+            batches_iterable.set_description('Assigning buckets of %s card boards' % num_board_cards)
+        except NameError:
+            pass
+
+    for start in batches_iterable:
+        board_classes = np.arange(start, min(start + batch_size, num_board_classes))
+        points, valid = histograms.get_histograms(board_classes)
+        labels = np.argmin(_get_squared_distances(points, centers), axis=1)
+        buckets[start * NUM_HOLE_COMBINATIONS:(start + len(board_classes)) * NUM_HOLE_COMBINATIONS] = \
+            np.where(valid, labels, 0)
+
+    return histograms.board_class_keys, buckets
@@ -0,0 +1,102 @@
+import mmap
+import multiprocessing
+import random
+import time
+
+import numpy as np
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
+
+
+SHARED_ARRAYS = ['regret_sum', 'strategy_sum', 'last_iteration', 'log_regret_discounts']
+
+
+def share_array(values):
+    """Copies array into anonymous shared memory inherited by forked worker processes."""
+    shared_memory = mmap.mmap(-1, max(values.nbytes, 1))
+    shared_values = np.frombuffer(shared_memory, dtype=values.dtype, count=values.size).reshape(values.shape)
+    shared_values[...] = values
+    return shared_values
+
+
+def _worker(cfr, next_iteration, last_iteration, batch_size):
+    """Runs batches of CFR iterations until all iterations are taken by the workers."""
+    random.seed()
+    np.random.seed()
+    while True:
+        with next_iteration.get_lock():
+            batch_start = next_iteration.value
+            next_iteration.value = min(batch_start + batch_size, last_iteration + 1)
+        if batch_start > last_iteration:
+            return
+
+        cfr.iteration = batch_start - 1
+        for i in range(min(batch_size, last_iteration - batch_start + 1)):
+            cfr.run_iteration()
+
+
+def train_parallel(cfr, iterations, workers, batch_size=100, show_progress=True):
+    """Run CFR iterations on multiple processes.
+
+    Regret and strategy sums of the array game tree are moved into shared
+    memory, which all forked worker processes update in place without
+    locking. Workers take batches of iteration numbers from a shared counter,
+    so each iteration number is run exactly once, but batches of different
+    workers run concurrently and out of order. Variants weighting by iteration
+    number therefore mix weights of iterations up to workers * batch_size apart,
+    and DCFR nodes are discounted only forward to the latest iteration that
+    visited them, so updates of older batches arriving later are not discounted.
+    Nodes near the root, such as the preflop nodes, are written by every
+    iteration, so their concurrent updates regularly lose sampled updates
+    of some iterations. Nodes deep in a large tree are rarely updated at once.
+
+    Args:
+        cfr (Cfr): CFR instance with array game tree.
+        iterations (int): Number of iterations.
+        workers (int): Number of worker processes.
+        batch_size (int): Number of iterations a worker takes at once.
+        show_progress (bool): Show training progress bar.
+    """
+    if not cfr.array_tree:
+        raise ValueError('Parallel training requires CFR with array game tree')
+
+    tree = cfr.game_tree.tree
+    for name in SHARED_ARRAYS:
+        setattr(tree, name, share_array(getattr(tree, name)))
+
+    first_iteration = cfr.iteration + 1
+    last_iteration = cfr.iteration + iterations
+    context = multiprocessing.get_context('fork')
+    next_iteration = context.Value('q', first_iteration)
+    processes = [context.Process(target=_worker, args=(cfr, next_iteration, last_iteration, batch_size))
+                 for w in range(workers)]
+    for process in processes:
+        process.start()
+
+    progress = None
+    if show_progress:
+        try:
+            progress = tqdm(total=iterations)
+            progress.set_description('Parallel CFR training')
+        except NameError:
+            pass
+    while any(process.is_alive() for process in processes):
+        time.sleep(0.5)
+        if progress is not None:
+            progress.n = min(next_iteration.value, last_iteration + 1) - first_iteration
+            progress.refresh()
+    if progress is not None:
+        progress.close()
+
+    for process in processes:
+        process.join()
+        if process.exitcode != 0:
+            raise RuntimeError('CFR worker process failed with exit code %s' % process.exitcode)
+
+    for name in SHARED_ARRAYS:
+        setattr(tree, name, np.array(getattr(tree, name)))
+    cfr.iteration = last_iteration
+    cfr.calculate_average_strategy()
@@ -0,0 +1,108 @@
+from collections import OrderedDict
+
+import numpy as np
+
+from cfr_utils.hand_evaluation import get_table_evaluator
+from cfr_utils.hand_strength import HOLE_MASKS
+from cfr_utils.isomorphism import (HOLE_CARD_IDS, MAX_BOARD_CARDS, NUM_HOLE_COMBINATIONS, canonicalize_boards,
+                                   get_hole_indices)
+
+"""Whether two hole card combinations share a card"""
+HOLE_CONFLICTS = (HOLE_MASKS[:, np.newaxis] & HOLE_MASKS[np.newaxis, :]) != 0
+
+
+def _get_valid_holes(board_card_ids):
+    board_mask = 0
+    for card_id in board_card_ids:
+        board_mask |= 1 << int(card_id)
+    return (HOLE_MASKS & board_mask) == 0
+
+
+def get_valid_matchups(board_card_ids):
+    """Returns (1326, 1326) mask of pairs of hole cards without any common card with each other or the board."""
+    valid_holes = _get_valid_holes(board_card_ids)
+    return valid_holes[:, np.newaxis] & valid_holes[np.newaxis, :] & ~HOLE_CONFLICTS
+
+
+def get_showdown_outcomes(board_card_ids):
+    """Computes showdown outcomes of all pairs of hole cards on a complete board.
+
+    All 1326 hole card combinations are ranked in a single batch and the ranks
+    are compared by broadcasting.
+
+    Args:
+        board_card_ids (list): Card ids 0..51 (see isomorphism) of 5 board cards.
+
+    Returns:
+        np.ndarray: Outcomes (1326, 1326) as int8, 1 when hole cards of the row beat hole cards
+                    of the column, -1 when they lose and 0 for ties and invalid pairs.
+    """
+    if len(board_card_ids) != MAX_BOARD_CARDS:
+        raise ValueError('Showdown outcomes require complete board of %s cards' % MAX_BOARD_CARDS)
+    valid_holes = _get_valid_holes(board_card_ids)
+    hole_card_ids = HOLE_CARD_IDS[valid_holes]
+    ranks = np.zeros(NUM_HOLE_COMBINATIONS, dtype=np.int16)
+    ranks[valid_holes] = get_table_evaluator().evaluate_batch(
+        np.column_stack([hole_card_ids, np.tile(board_card_ids, (len(hole_card_ids), 1))]))
+    outcomes = np.sign(ranks[np.newaxis, :] - ranks[:, np.newaxis]).astype(np.int8)
+    outcomes[~get_valid_matchups(board_card_ids)] = 0
+    return outcomes
+
+
+def get_range_equities(outcomes, valid, opponent_range):
+    """Returns equity (1326,) of each hole cards against opponent range, counting ties as half.
+
+    Args:
+        outcomes (np.ndarray): Showdown outcomes, see get_showdown_outcomes.
+        valid (np.ndarray): Valid pairs of hole cards, see get_valid_matchups.
+        opponent_range (np.ndarray): Weights (1326,) of opponent's hole cards.
+    """
+    weights = valid * opponent_range[np.newaxis, :]
+    total_weights = weights.sum(axis=1)
+    wins = (weights * ((outcomes + 1) / 2.0)).sum(axis=1)
+    return np.where(total_weights > 0, wins / np.maximum(total_weights, 1e-300), 0.0)
+
+
+class ShowdownCache:
+    """Bounded least recently used cache of showdown outcomes keyed by canonical board.
+
+    Suit-isomorphic boards share outcomes of their canonical board, whose rows
+    and columns are permuted by the relabeling of suits of the hole cards.
+    Cached outcomes are read-only, as they are returned without copying
+    when the board needs no relabeling.
+    """
+
+    def __init__(self, max_size=128):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._outcomes = OrderedDict()
+
+    def get_outcomes(self, board_card_ids):
+        """Returns showdown outcomes (see get_showdown_outcomes) and valid pairs (see get_valid_matchups)."""
+        board_card_ids = np.asarray(board_card_ids, dtype=np.int64)
+        keys, canonical_suits = canonicalize_boards(board_card_ids[np.newaxis, :])
+        key = int(keys[0])
+
+        outcomes = self._outcomes.get(key)
+        if outcomes is not None:
+            self.hits += 1
+            self._outcomes.move_to_end(key)
+        else:
+            self.misses += 1
+            canonical_board = (board_card_ids & ~3) | canonical_suits[0][board_card_ids & 3]
+            outcomes = get_showdown_outcomes(canonical_board.tolist())
+            outcomes.flags.writeable = False
+            self._outcomes[key] = outcomes
+            if len(self._outcomes) > self.max_size:
+                self._outcomes.popitem(last=False)
+
+        valid = get_valid_matchups(board_card_ids.tolist())
+        if (canonical_suits[0] == np.arange(4)).all():
+            return outcomes, valid
+        canonical_holes = (HOLE_CARD_IDS & ~3) | canonical_suits[0][HOLE_CARD_IDS & 3]
+        hole_indices = get_hole_indices(canonical_holes[:, 0], canonical_holes[:, 1])
+        return outcomes.take(hole_indices, axis=0).take(hole_indices, axis=1), valid
+
+    def __len__(self):
+        return len(self._outcomes)
@@ -0,0 +1,243 @@
+import numpy as np
+
+from cfr_utils.table_store import load_or_build_table
+from deuces.card import Card as DeucesCard
+from deuces.evaluator import Evaluator as DeucesEvaluator
+from deuces.lookup import LookupTable
+
+NUM_RANKS = 13
+MAX_HAND_SIZE = 7
+MAX_RANK_COUNT = 4
+RANK_TABLE_WIDTH = NUM_RANKS + 1
+
+""" Rank of hands which cannot be evaluated, for example the flush rank of suit with less than 5 cards """
+INVALID_RANK = LookupTable.MAX_HIGH_CARD + 1
+
+""" Batch evaluation takes card ids 0..51 equal to rank * 4 + suit with ranks 2..A as 0..12
+and suits clubs, diamonds, hearts and spades as 0..3. This is their Deuces card. """
+CARD_ID_TO_DEUCES = [DeucesCard.new(DeucesCard.STR_RANKS[card_id // 4] + 'cdhs'[card_id % 4]) for card_id in range(52)]
+
+""" pypokerengine suit and rank of a card to Deuces card """
+_PYPOKER_TO_DEUCES = {
+    (suit, rank): DeucesCard.new(DeucesCard.STR_RANKS[rank - 2] + suit_char)
+    for suit, suit_char in [(2, 'c'), (4, 'd'), (8, 'h'), (16, 's')]
+    for rank in range(2, 15)
+}
+
+
+def _build_rank_table():
+    """Builds transitions between multisets of card ranks and the best non-flush rank of each multiset.
+
+    Multisets of up to 7 ranks are numbered in breadth first order from the empty
+    multiset 0. Each multiset has a row of RANK_TABLE_WIDTH entries, where entry
+    of a rank is the multiset with one more card of that rank and the last entry
+    is the Deuces rank of the best 5 card hand of the multiset ignoring suits.
+    """
+    unsuited_lookup = LookupTable().unsuited_lookup
+    state_ids = {(0,) * NUM_RANKS: 0}
+    level = [(0,) * NUM_RANKS]
+    transitions = [[0] * NUM_RANKS]
+    values = [INVALID_RANK]
+
+    for hand_size in range(1, MAX_HAND_SIZE + 1):
+        next_level = []
+        for counts in level:
+            state = state_ids[counts]
+            for rank in range(NUM_RANKS):
+                if counts[rank] == MAX_RANK_COUNT:
+                    continue
+                next_counts = counts[:rank] + (counts[rank] + 1,) + counts[rank + 1:]
+                next_state = state_ids.get(next_counts)
+                if next_state is None:
+                    next_state = state_ids[next_counts] = len(values)
+                    next_level.append(next_counts)
+                    transitions.append([0] * NUM_RANKS)
+                    if hand_size == 5:
+                        prime_product = 1
+                        for next_rank, count in enumerate(next_counts):
+                            prime_product *= DeucesCard.PRIMES[next_rank] ** count
+                        values.append(unsuited_lookup[prime_product])
+                    else:
+                        values.append(INVALID_RANK)
+                transitions[state][rank] = next_state
+                if hand_size > 5:
+                    """ Best hand of 6 or 7 cards is the best hand after leaving out one of the cards """
+                    values[next_state] = min(values[next_state], values[state])
+        level = next_level
+
+    return np.column_stack([np.array(transitions, dtype=np.int32), np.array(values, dtype=np.int32)]).reshape(-1)
+
+
+def _build_flush_table():
+    """Builds Deuces rank of the best flush of 13 bit masks of ranks of a single suit."""
+    flush_lookup = LookupTable().flush_lookup
+    flush_ranks = np.full(1 << NUM_RANKS, INVALID_RANK, dtype=np.int32)
+    for mask in sorted(range(1 << NUM_RANKS), key=lambda mask: bin(mask).count('1')):
+        card_count = bin(mask).count('1')
+        if card_count == 5:
+            flush_ranks[mask] = flush_lookup[DeucesCard.prime_product_from_rankbits(mask)]
+        elif card_count > 5:
+            flush_ranks[mask] = min(flush_ranks[mask & ~(1 << rank)] for rank in range(NUM_RANKS)
+                                    if mask & (1 << rank))
+    return flush_ranks
+
+
+class _StoredLookup:
+    """Mapping of prime products of ranks to hand ranks searched in sorted, memory-mapped arrays."""
+
+    def __init__(self, primes, ranks):
+        self.primes = primes
+        self.ranks = ranks
+
+    def __getitem__(self, prime):
+        index = int(np.searchsorted(self.primes, prime))
+        if index == len(self.primes) or self.primes[index] != prime:
+            raise KeyError(prime)
+        return int(self.ranks[index])
+
+    def __len__(self):
+        return len(self.primes)
+
+
+def _build_deuces_lookup():
+    """Rows of the stored lookup are flush flag, prime product of ranks and hand rank, sorted by flag and prime."""
+    table = LookupTable()
+    rows = [(1, prime, rank) for prime, rank in table.flush_lookup.items()]
+    rows += [(0, prime, rank) for prime, rank in table.unsuited_lookup.items()]
+    rows = np.array(rows, dtype=np.int64).T
+    return rows[:, np.lexsort((rows[1], rows[0]))]
+
+
+def load_deuces_lookup():
+    """Returns Deuces LookupTable whose lookups search the stored table in place.
+
+    The table is built once and stored by table_store, later processes only
+    memory-map it, so it is never copied into Python dicts of each process.
+    """
+    flush, primes, ranks = load_or_build_table('deuces_sorted_lookup', _build_deuces_lookup)
+    num_unsuited = int(np.searchsorted(flush, 1))
+    table = LookupTable.__new__(LookupTable)
+    table.flush_lookup = _StoredLookup(primes[num_unsuited:], ranks[num_unsuited:])
+    table.unsuited_lookup = _StoredLookup(primes[:num_unsuited], ranks[:num_unsuited])
+    return table
+
+
+class TableEvaluator(DeucesEvaluator):
+    """Evaluates 5 to 7 card hands by a walk through precomputed tables.
+
+    Drop-in replacement of Deuces evaluator returning the same hand ranks.
+    Instead of evaluating each 5 card subset of the hand, ranks of the cards
+    are added one at a time to a multiset with a lookup in a state transition
+    table, whose final state maps directly to the best non-flush rank of the hand.
+    Flushes are looked up by the 13 bit mask of ranks of each suit.
+    Tables are built once and stored by table_store, so later processes
+    only memory-map them. The rank table stores the transitions of the rank
+    multiset reached after each card, so ranks of hands sharing the same
+    board can continue the walk from the state of the board.
+    """
+
+    def __init__(self):
+        """ Inherited Deuces methods, such as evaluation of 5 card subsets, use the stored Deuces lookup """
+        super(TableEvaluator, self).__init__(load_deuces_lookup())
+        self.rank_array = load_or_build_table('seven_card_ranks', _build_rank_table)
+        self.flush_array = load_or_build_table('seven_card_flushes', _build_flush_table)
+
+        """ Indexing memory views gives Python ints, which is much faster than indexing NumPy arrays """
+        self.rank_table = memoryview(self.rank_array)
+        self.flush_table = memoryview(self.flush_array)
+
+    def evaluate(self, cards, board):
+        """Returns Deuces rank (1 is the best) of the best 5 card hand of Deuces cards and board."""
+        rank_table = self.rank_table
+        state = 0
+        suit_masks = [0] * 9
+        for card in cards:
+            state = rank_table[state * RANK_TABLE_WIDTH + ((card >> 8) & 0xF)]
+            suit_masks[(card >> 12) & 0xF] |= card >> 16
+        for card in board:
+            state = rank_table[state * RANK_TABLE_WIDTH + ((card >> 8) & 0xF)]
+            suit_masks[(card >> 12) & 0xF] |= card >> 16
+
+        flush_table = self.flush_table
+        return min(rank_table[state * RANK_TABLE_WIDTH + NUM_RANKS], flush_table[suit_masks[1]],
+                   flush_table[suit_masks[2]], flush_table[suit_masks[4]], flush_table[suit_masks[8]])
+
+    def evaluate_batch(self, card_ids):
+        """Returns Deuces ranks of hands given as rows of card ids.
+
+        Args:
+            card_ids (np.ndarray): Integer array (N, 5..7) of card ids, see CARD_ID_TO_DEUCES.
+
+        Returns:
+            np.ndarray: Array (N,) of Deuces ranks, 1 is the best.
+        """
+        """ Small integer types such as int8 overflow the 13 bit rank masks """
+        card_ids = np.asarray(card_ids, dtype=np.int64)
+        ranks = card_ids >> 2
+        suits = card_ids & 3
+
+        state = np.zeros(len(card_ids), dtype=np.int32)
+        for column in range(card_ids.shape[1]):
+            state = self.rank_array[state * RANK_TABLE_WIDTH + ranks[:, column]]
+        hand_ranks = self.rank_array[state * RANK_TABLE_WIDTH + NUM_RANKS]
+
+        rank_bits = np.left_shift(1, ranks)
+        for suit in range(4):
+            suit_masks = np.where(suits == suit, rank_bits, 0).sum(axis=1)
+            hand_ranks = np.minimum(hand_ranks, self.flush_array[suit_masks])
+        return hand_ranks
+
+    def score_hand(self, hole, community):
+        """Returns score of pypokerengine cards, higher score is better hand.
+        Can be used as GameEvaluator.hand_scorer."""
+        return INVALID_RANK - self.evaluate([_PYPOKER_TO_DEUCES[(card.suit, card.rank)] for card in hole],
+                                            [_PYPOKER_TO_DEUCES[(card.suit, card.rank)] for card in community])
+
+
+class IncrementalEvaluator:
+    """Evaluation state of a hand whose cards are added one street at a time.
+
+    Keeps the rank multiset state of the rank table, the 13 bit rank mask of each
+    suit and the best flush rank, so adding a card costs a single transition and
+    a flush lookup of its suit regardless of the cards added before. Masks of
+    suits only grow, so the best flush rank never needs to be looked up again
+    for the other suits. Cards are given as card ids, see CARD_ID_TO_DEUCES.
+    """
+
+    __slots__ = ('rank_table', 'flush_table', 'state', 'suit_masks', 'flush_rank', 'num_cards')
+
+    def __init__(self, evaluator, card_ids=()):
+        self.rank_table = evaluator.rank_table
+        self.flush_table = evaluator.flush_table
+        self.state = 0
+        self.suit_masks = [0] * 4
+        self.flush_rank = INVALID_RANK
+        self.num_cards = 0
+        self.add_cards(card_ids)
+
+    def add_cards(self, card_ids):
+        rank_table = self.rank_table
+        suit_masks = self.suit_masks
+        state = self.state
+        for card_id in card_ids:
+            state = rank_table[state * RANK_TABLE_WIDTH + (card_id >> 2)]
+            suit = card_id & 3
+            suit_masks[suit] |= 1 << (card_id >> 2)
+            self.flush_rank = min(self.flush_rank, self.flush_table[suit_masks[suit]])
+        self.state = state
+        self.num_cards += len(card_ids)
+
+    def copy(self):
+        """Returns independent state of the same cards, for example to branch into different next cards."""
+        hand = IncrementalEvaluator.__new__(IncrementalEvaluator)
+        hand.rank_table = self.rank_table
+        hand.flush_table = self.flush_table
+        hand.state = self.state
+        hand.suit_masks = list(self.suit_masks)
+        hand.flush_rank = self.flush_rank
+        hand.num_cards = self.num_cards
+        return hand
+
+    def get_rank(self):
+        """Returns Deuces rank of the best 5 card hand of the cards added so far, which must be 5 to 7 cards."""
+        return min(self.rank_table[self.state * RANK_TABLE_WIDTH + NUM_RANKS], self.flush_rank)
@@ -0,0 +1,46 @@
+import os
+
+import numpy as np
+
+"""Precomputed tables are stored in this directory as .npy files, it can be moved by CFR_TABLES_DIR variable."""
+TABLES_DIR = os.environ.get('CFR_TABLES_DIR',
+                            os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'tables'))
+
+
+def get_table_path(name):
+    return os.path.join(TABLES_DIR, name + '.npy')
+
+
+def load_table(name):
+    """Returns read-only memory map of stored table, or None when the table was not stored yet."""
+    try:
+        return np.load(get_table_path(name), mmap_mode='r')
+    except (IOError, ValueError):
+        return None
+
+
+def save_table(name, table):
+    """Stores table atomically, so concurrent processes never read a partially written table.
+
+    Returns:
+        bool: Whether the table was stored, tables are only kept in memory when the directory is not writable.
+    """
+    path = get_table_path(name)
+    temporary_path = '%s.%s.tmp' % (path, os.getpid())
+    try:
+        os.makedirs(TABLES_DIR, exist_ok=True)
+        with open(temporary_path, 'wb') as file:
+            np.save(file, table)
+        os.replace(temporary_path, path)
+        return True
+    except OSError:
+        return False
+
+
+def load_or_build_table(name, build):
+    """Returns stored table, building and storing it by calling build() when it is missing."""
+    table = load_table(name)
+    if table is None:
+        table = build()
+        save_table(name, table)
+    return table
@@ -0,0 +1,188 @@
+import numpy as np
+
+from constants import BUCKET_NUM, NUM_ACTIONS, FOLD
+from cfr_utils.array_tree import ACTION_NODE, BOARD_CARDS_NODE, TERMINAL_NODE, ArrayGameTreeBuilder
+from cfr_utils.cfr import CFR_PLUS, DCFR, VANILLA, VARIANTS, DiscountSchedule
+
+try:
+    from tqdm import tqdm
+except ImportError:
+    pass
+
+
+def get_terminal_values(bucket_model, pot_commitment, round_index, reach_probs, players_folded):
+    """Returns counterfactual values of each player's bucket sequences in terminal nodes
+    with given pot commitment, reached with given reach probabilities of bucket sequences."""
+    prize = float(sum(pot_commitment))
+
+    if sum(players_folded) == len(players_folded) - 1:
+        joint = bucket_model.joint[round_index]
+        utility = [-pot_commitment[p] if players_folded[p] else prize - pot_commitment[p]
+                   for p in range(len(players_folded))]
+        return [utility[0] * joint.dot(reach_probs[1]),
+                utility[1] * joint.T.dot(reach_probs[0])]
+
+    return [
+        (prize - pot_commitment[0]) * bucket_model.win.dot(reach_probs[1])
+        + (prize / 2 - pot_commitment[0]) * bucket_model.tie.dot(reach_probs[1])
+        - pot_commitment[0] * bucket_model.loss.dot(reach_probs[1]),
+        (prize - pot_commitment[1]) * bucket_model.loss.T.dot(reach_probs[0])
+        + (prize / 2 - pot_commitment[1]) * bucket_model.tie.T.dot(reach_probs[0])
+        - pot_commitment[1] * bucket_model.win.T.dot(reach_probs[0]),
+    ]
+
+
+class VectorCfr:
+    """CFR traversing the public tree once per iteration for all buckets at once.
+
+    Nodes of the array game tree that share the same public action history
+    are visited together as a vector of node ids indexed by bucket sequence
+    (see BucketModel). Reach probabilities and counterfactual values are
+    NumPy vectors over these sequences, so each action node updates regrets
+    of all its information sets in one operation. Chance probabilities are
+    folded into the bucket model matrices used at terminal nodes.
+
+    The trained strategy is stored in the array game tree, so game_tree
+    can be written out the same way as the game tree of Cfr.
+    """
+
+    def __init__(self, game, bucket_model, variant=VANILLA, discount_schedule=None):
+        """Build new vectorized CFR instance.
+        Args:
+            game (Game): game definition object.
+            bucket_model (BucketModel): chance model of the bucketed game.
+            variant (str): CFR variant, one of cfr.VARIANTS.
+            discount_schedule (DiscountSchedule): DCFR discount parameters.
+        """
+        if variant not in VARIANTS:
+            raise ValueError('Unknown CFR variant %s' % variant)
+        if game.get_num_players() != 2:
+            raise ValueError('Vectorized CFR supports only games with 2 players')
+        if bucket_model.num_rounds != game.get_num_rounds():
+            raise ValueError('Bucket model was estimated for game with different number of rounds')
+
+        self.game = game
+        self.bucket_model = bucket_model
+        self.player_count = game.get_num_players()
+        self.variant = variant
+        self.discount_schedule = discount_schedule or DiscountSchedule()
+        self.iteration = 0
+
+        game_tree_builder = ArrayGameTreeBuilder(game)
+        try:
+            with tqdm(total=1) as progress:
+                progress.set_description('Building game tree')
+                self.game_tree = game_tree_builder.build_tree()
+                progress.update(1)
+        except NameError:
+            self.game_tree = game_tree_builder.build_tree()
+
+        self.tree = self.game_tree.tree
+
+    def train(self, iterations, show_progress=True):
+        """Run vectorized CFR for given number of iterations.
+
+        The result strategy is stored in average_strategy
+        of each ActionNode in game_tree.
+
+        Args:
+            iterations (int): Number of iterations.
+            show_progress (bool): Show training progress bar.
+        """
+        if not show_progress:
+            iterations_iterable = range(iterations)
+        else:
+            try:
+                iterations_iterable = tqdm(range(iterations))
+                iterations_iterable.set_description('Vectorized CFR training')
+            except NameError:
+                iterations_iterable = range(iterations)
+
+        root_ids = self.tree.children[self.tree.root_id, :BUCKET_NUM]
+        for i in iterations_iterable:
+            self.iteration += 1
+            self._cfr(root_ids, 0,
+                      [np.ones(BUCKET_NUM)] * self.player_count,
+                      [False] * self.player_count)
+
+        self.tree.calculate_average_strategy()
+
+    def _cfr(self, node_ids, round_index, reach_probs, players_folded):
+        """Returns counterfactual values of each player's bucket sequences in given nodes."""
+        node_type = self.tree.node_type[node_ids[0]]
+        if node_type == TERMINAL_NODE:
+            return self._cfr_terminal(node_ids, round_index, reach_probs, players_folded)
+        elif node_type == BOARD_CARDS_NODE:
+            return self._cfr_board_cards(node_ids, round_index, reach_probs, players_folded)
+        elif node_type == ACTION_NODE:
+            return self._cfr_action(node_ids, round_index, reach_probs, players_folded)
+        raise RuntimeError('Unexpected node type %s inside the game tree' % node_type)
+
+    def _cfr_terminal(self, node_ids, round_index, reach_probs, players_folded):
+        return get_terminal_values(self.bucket_model, self.tree.pot_commitment[node_ids[0]],
+                                   round_index, reach_probs, players_folded)
+
+    def _cfr_board_cards(self, node_ids, round_index, reach_probs, players_folded):
+        """ Each bucket sequence branches into BUCKET_NUM longer sequences of the next round. """
+        next_node_ids = self.tree.children[node_ids, :BUCKET_NUM].reshape(-1)
+        next_reach_probs = [np.repeat(reach_prob, BUCKET_NUM) for reach_prob in reach_probs]
+
+        next_values = self._cfr(next_node_ids, round_index + 1, next_reach_probs, players_folded)
+        return [values.reshape(-1, BUCKET_NUM).sum(axis=1) for values in next_values]
+
+    @staticmethod
+    def _get_strategy(regret_sum, valid_actions):
+        """ Regret matching for all information sets of the public node at once. """
+        positive_regrets = np.maximum(regret_sum, 0) * valid_actions
+        normalizing_sum = positive_regrets.sum(axis=1, keepdims=True)
+        uniform = valid_actions / float(valid_actions.sum())
+        return np.where(normalizing_sum > 0,
+                        positive_regrets / np.maximum(normalizing_sum, 1e-300),
+                        uniform)
+
+    def _cfr_action(self, node_ids, round_index, reach_probs, players_folded):
+        tree = self.tree
+        node_player = tree.player[node_ids[0]]
+        actions = [a for a in range(NUM_ACTIONS) if tree.children[node_ids[0], a] >= 0]
+        valid_actions = tree.children[node_ids[0], :NUM_ACTIONS] >= 0
+
+        if self.variant == DCFR and self.iteration > 1:
+            """ Every public node is visited in each iteration, so only the last iteration is discounted """
+            positive_discount, negative_discount, strategy_discount = \
+                self.discount_schedule.get_factors(self.iteration - 1, self.iteration - 1)
+            regret_sum = tree.regret_sum[node_ids]
+            tree.regret_sum[node_ids] = regret_sum * np.where(regret_sum > 0, positive_discount, negative_discount)
+            tree.strategy_sum[node_ids] *= strategy_discount
+
+        strategy = VectorCfr._get_strategy(tree.regret_sum[node_ids], valid_actions)
+        tree.strategy[node_ids] = strategy
+        strategy_weight = self.iteration if self.variant == CFR_PLUS else 1
+        tree.strategy_sum[node_ids] += (strategy_weight * reach_probs[node_player])[:, np.newaxis] * strategy
+
+        util = [None] * NUM_ACTIONS
+        node_util = [np.zeros(len(node_ids)) for p in range(self.player_count)]
+        for a in actions:
+            next_reach_probs = list(reach_probs)
+            next_reach_probs[node_player] = reach_probs[node_player] * strategy[:, a]
+
+            if a == FOLD:
+                next_players_folded = list(players_folded)
+                next_players_folded[node_player] = True
+            else:
+                next_players_folded = players_folded
+
+            action_util = self._cfr(tree.children[node_ids, a], round_index,
+                                    next_reach_probs, next_players_folded)
+            util[a] = action_util[node_player]
+            for player in range(self.player_count):
+                if player == node_player:
+                    node_util[player] += strategy[:, a] * action_util[player]
+                else:
+                    node_util[player] += action_util[player]
+
+        for a in actions:
+            tree.regret_sum[node_ids, a] += util[a] - node_util[node_player]
+        if self.variant == CFR_PLUS:
+            tree.regret_sum[node_ids] = np.maximum(tree.regret_sum[node_ids], 0)
+
+        return node_util
@@ -0,0 +1,128 @@
+import itertools
+import math
+from statistics import NormalDist
+
+import numpy as np
+
+from cfr_utils.hand_evaluation import get_table_evaluator
+from pypokerengine.engine.card import Card
+
+"""Card ids 0..51 of the batch evaluator are rank * 4 + suit index"""
+SUIT_INDEX = {Card.CLUB: 0, Card.DIAMOND: 1, Card.HEART: 2, Card.SPADE: 3}
+
+
+def to_card_ids(cards):
+    """Returns card ids of the batch evaluator (see table_evaluator) of pypokerengine cards."""
+    return [(card.rank - 2) * 4 + SUIT_INDEX[card.suit] for card in cards]
+
+
+def estimate_win_rate(nb_simulation, nb_player, hole_card, community_card=None, confidence=0.95):
+    """Vectorized Monte Carlo estimate of the win rate of hole cards against nb_player - 1 opponents.
+
+    All missing board cards and opponents' hole cards of every simulation are sampled
+    at once as a NumPy array and hands are ranked by the batch evaluator. Like
+    estimate_hole_card_win_rate of pypokerengine card_utils, a tie with the best opponent
+    counts as a win, but hands are ranked exactly, while HandEvaluator breaks ties only
+    by ranks of hole cards.
+
+    Args:
+        nb_simulation (int): Number of simulations.
+        nb_player (int): Number of players including the owner of the hole cards.
+        hole_card (list): pypokerengine Cards of the hole cards.
+        community_card (list): pypokerengine Cards already on the board.
+        confidence (float): Confidence level of the interval.
+
+    Returns:
+        (float, (float, float)): Win rate and its Wilson score confidence interval.
+    """
+    if not community_card:
+        community_card = []
+    hole_ids = to_card_ids(hole_card)
+    community_ids = to_card_ids(community_card)
+    unused_ids = _get_unused_card_ids(hole_ids + community_ids)
+    need_num = 5 - len(community_ids)
+    draw_num = need_num + 2 * (nb_player - 1)
+    draws = unused_ids[np.argsort(np.random.rand(nb_simulation, len(unused_ids)), axis=1)[:, :draw_num]]
+    wins = _count_wins(hole_ids, community_ids, draws[:, :need_num],
+                       draws[:, need_num:].reshape(nb_simulation, nb_player - 1, 2))
+    return _get_win_rate_interval(wins, nb_simulation, confidence)
+
+
+def calculate_win_rate(nb_player, hole_card, community_card=None, max_combination=100000, nb_simulation=10000,
+                       confidence=0.95):
+    """Win rate of hole cards against nb_player - 1 opponents, exact when the deals can be enumerated.
+
+    When the number of possible deals of missing board cards and opponents' hole cards
+    is at most max_combination, all of them are enumerated and ranked by the batch
+    evaluator, which covers heads-up turn (45540 deals) and river (990 deals).
+    Otherwise the win rate is estimated by estimate_win_rate with nb_simulation simulations.
+
+    Returns:
+        (float, (float, float)): Win rate and its confidence interval, which is a single
+                                 point when the win rate is exact.
+    """
+    if not community_card:
+        community_card = []
+    hole_ids = to_card_ids(hole_card)
+    community_ids = to_card_ids(community_card)
+    unused_ids = _get_unused_card_ids(hole_ids + community_ids)
+    need_num = 5 - len(community_ids)
+    combination_num = math.comb(len(unused_ids), need_num)
+    for i in range(nb_player - 1):
+        combination_num *= math.comb(len(unused_ids) - need_num - 2 * i, 2)
+    if combination_num > max_combination:
+        return estimate_win_rate(nb_simulation, nb_player, hole_card, community_card, confidence)
+
+    boards, opponents_holes = _enumerate_deals(unused_ids, need_num, nb_player - 1)
+    win_rate = 1.0 * _count_wins(hole_ids, community_ids, boards, opponents_holes) / len(boards)
+    return win_rate, (win_rate, win_rate)
+
+
+def _get_unused_card_ids(used_ids):
+    used = set(used_ids)
+    return np.array([card_id for card_id in range(52) if card_id not in used])
+
+
+def _get_combinations(card_num, choice_num):
+    combinations = list(itertools.combinations(range(card_num), choice_num))
+    complements = [[i for i in range(card_num) if i not in combination] for combination in combinations]
+    return (np.array(combinations, dtype=np.int64).reshape(len(combinations), choice_num),
+            np.array(complements, dtype=np.int64))
+
+
+def _enumerate_deals(unused_ids, need_num, nb_opponent):
+    """ Every deal keeps the array of its remaining cards, all of the same length,
+    so the next cards are dealt by indexing it with the same combinations """
+    combinations, complements = _get_combinations(len(unused_ids), need_num)
+    boards = unused_ids[combinations]
+    remaining = unused_ids[complements]
+    opponents_holes = np.zeros((len(boards), 0, 2), dtype=np.int64)
+    for i in range(nb_opponent):
+        combinations, complements = _get_combinations(remaining.shape[1], 2)
+        deal_num = len(boards) * len(combinations)
+        boards = np.repeat(boards, len(combinations), axis=0)
+        opponents_holes = np.concatenate([np.repeat(opponents_holes, len(combinations), axis=0),
+                                          remaining[:, combinations].reshape(deal_num, 1, 2)], axis=1)
+        remaining = remaining[:, complements].reshape(deal_num, -1)
+    return boards, opponents_holes
+
+
+def _count_wins(hole_ids, community_ids, boards, opponents_holes):
+    nb_simulation, nb_opponent = opponents_holes.shape[:2]
+    boards = np.concatenate([np.tile(community_ids, (nb_simulation, 1)), boards], axis=1).astype(np.int64)
+    my_hands = np.concatenate([np.tile(hole_ids, (nb_simulation, 1)), boards], axis=1)
+    opponents_hands = np.concatenate([opponents_holes, np.repeat(boards[:, np.newaxis, :], nb_opponent, axis=1)],
+                                     axis=2).reshape(-1, 7)
+    ranks = get_table_evaluator().evaluate_batch(np.concatenate([my_hands, opponents_hands]))
+    best_opponent_ranks = ranks[nb_simulation:].reshape(nb_simulation, nb_opponent).min(axis=1)
+    return int((ranks[:nb_simulation] <= best_opponent_ranks).sum())
+
+
+def _get_win_rate_interval(win_count, nb_simulation, confidence):
+    win_rate = 1.0 * win_count / nb_simulation
+    z = NormalDist().inv_cdf(0.5 + confidence / 2)
+    denominator = 1 + z * z / nb_simulation
+    center = (win_rate + z * z / (2 * nb_simulation)) / denominator
+    margin = z * math.sqrt(win_rate * (1 - win_rate) / nb_simulation
+                           + z * z / (4 * nb_simulation * nb_simulation)) / denominator
+    return win_rate, (center - margin, center + margin)
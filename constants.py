@@ -1,6 +1,15 @@
 NUM_ACTIONS = 3
 BUCKET_NUM = 5
 
+""" Postflop bucketing by hand rank of the current board, expected hand strength, expected squared
+hand strength (see build_hand_strength_tables.py) or k-means clusters of equity distributions
+(see build_bucket_tables.py) """
+HAND_RANK_BUCKETING = 'hand_rank'
+EHS_BUCKETING = 'ehs'
+EHS2_BUCKETING = 'ehs2'
+KMEANS_BUCKETING = 'kmeans'
+BUCKETING = HAND_RANK_BUCKETING
+
 FOLD = 0
 CALL = 1
 RAISE = 2
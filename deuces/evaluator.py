@@ -14,9 +14,9 @@ class Evaluator(object):
     all calculations are done with bit arithmetic and table lookups. 
     """
 
-    def __init__(self):
+    def __init__(self, table=None):
 
-        self.table = LookupTable()
+        self.table = LookupTable() if table is None else table
         
         self.hand_size_map = {
             5 : self._five,
@@ -1,5 +1,4 @@
-from functools import reduce
-from itertools import groupby
+from pypokerengine.engine.card import Card
 
 class HandEvaluator:
 
@@ -25,9 +24,15 @@ class HandEvaluator:
       STRAIGHTFLASH: "STRAIGHTFLASH"
   }
 
+  __SUITS = (Card.CLUB, Card.DIAMOND, Card.HEART, Card.SPADE)
+
   @classmethod
   def gen_hand_rank_info(self, hole, community):
-    hand = self.eval_hand(hole, community)
+    return self.gen_hand_rank_info_from_score(self.eval_hand(hole, community), hole)
+
+  # Same as gen_hand_rank_info for hand already scored by eval_hand
+  @classmethod
+  def gen_hand_rank_info_from_score(self, hand, hole):
     row_strength = self.__mask_hand_strength(hand)
     strength = self.HAND_STRENGTH_MAP[row_strength]
     hand_high = self.__mask_hand_high_rank(hand)
@@ -69,170 +74,58 @@ class HandEvaluator:
   #       straight flash of rank 7 => 10000000 0111 0000
   @classmethod
   def __calc_hand_info_flg(self, hole, community):
-    cards = hole + community
-    if self.__is_straightflash(cards): return self.STRAIGHTFLASH | self.__eval_straightflash(cards)
-    if self.__is_fourcard(cards): return self.FOURCARD | self.__eval_fourcard(cards)
-    if self.__is_fullhouse(cards): return self.FULLHOUSE | self.__eval_fullhouse(cards)
-    if self.__is_flash(cards): return self.FLASH | self.__eval_flash(cards)
-    if self.__is_straight(cards): return self.STRAIGHT | self.__eval_straight(cards)
-    if self.__is_threecard(cards): return self.THREECARD | self.__eval_threecard(cards)
-    if self.__is_twopair(cards): return self.TWOPAIR | self.__eval_twopair(cards)
-    if self.__is_onepair(cards): return self.ONEPAIR | (self.__eval_onepair(cards))
-    return self.__eval_holecard(hole)
-
-  @classmethod
-  def __eval_holecard(self, hole):
-    ranks = sorted([card.rank for card in hole])
-    return ranks[1] << 4 | ranks[0]
-
-  @classmethod
-  def __is_onepair(self, cards):
-    return self.__eval_onepair(cards) != 0
-
-  @classmethod
-  def __eval_onepair(self, cards):
-    rank = 0
-    memo = 0  # bit memo
-    for card in cards:
-      mask = 1 << card.rank
-      if memo & mask != 0: rank = max(rank, card.rank)
-      memo |= mask
-    return rank << 4
-
-  @classmethod
-  def __is_twopair(self, cards):
-    return len(self.__search_twopair(cards)) == 2
-
-  @classmethod
-  def __eval_twopair(self, cards):
-    ranks = self.__search_twopair(cards)
-    return ranks[0] << 4 | ranks[1]
-
-  @classmethod
-  def __search_twopair(self, cards):
-    ranks = []
-    memo = 0
-    for card in cards:
-      mask = 1 << card.rank
-      if memo & mask != 0: ranks.append(card.rank)
-      memo |= mask
-    return sorted(ranks)[::-1][:2]
-
-  @classmethod
-  def __is_threecard(self, cards):
-    return self.__search_threecard(cards) != -1
-
-  @classmethod
-  def __eval_threecard(self, cards):
-    return self.__search_threecard(cards) << 4
-
-  @classmethod
-  def __search_threecard(self, cards):
-    rank = -1
-    bit_memo = reduce(lambda memo,card: memo + (1 << (card.rank-1)*3), cards, 0)
-    for r in range(2, 15):
-      bit_memo >>= 3
-      count = bit_memo & 7
-      if count >= 3: rank = r
-    return rank
-
-  @classmethod
-  def __is_straight(self, cards):
-    return self.__search_straight(cards) != -1
-
-  @classmethod
-  def __eval_straight(self, cards):
-    return self.__search_straight(cards) << 4
-
-  @classmethod
-  def __search_straight(self, cards):
-    bit_memo = reduce(lambda memo, card: memo | 1 << card.rank, cards, 0)
-    rank = -1
-    straight_check = lambda acc, i: acc & (bit_memo >> (r+i) & 1) == 1
-    for r in range(2, 15):
-      if reduce(straight_check, range(5), True): rank = r
-    return rank
-
-  @classmethod
-  def __is_flash(self, cards):
-    return self.__search_flash(cards) != -1
-
-  @classmethod
-  def __eval_flash(self, cards):
-    return self.__search_flash(cards) << 4
-
-  @classmethod
-  def __search_flash(self, cards):
-    best_suit_rank = -1
-    fetch_suit = lambda card: card.suit
-    fetch_rank = lambda card: card.rank
-    for suit, group_obj in groupby(sorted(cards, key=fetch_suit), key=fetch_suit):
-      g = list(group_obj)
-      if len(g) >= 5:
-        max_rank_card = max(g, key=fetch_rank)
-        best_suit_rank = max(best_suit_rank, max_rank_card.rank)
-    return best_suit_rank
-
-  @classmethod
-  def __is_fullhouse(self, cards):
-    r1, r2 = self.__search_fullhouse(cards)
-    return r1 and r2
-
-  @classmethod
-  def __eval_fullhouse(self, cards):
-    r1, r2 = self.__search_fullhouse(cards)
-    return r1 << 4 | r2
-
-  @classmethod
-  def __search_fullhouse(self, cards):
-    fetch_rank = lambda card: card.rank
-    three_card_ranks, two_pair_ranks = [], []
-    for rank, group_obj in groupby(sorted(cards, key=fetch_rank), key=fetch_rank):
-      g = list(group_obj)
-      if len(g) >= 3:
-        three_card_ranks.append(rank)
-      if len(g) >= 2:
-        two_pair_ranks.append(rank)
-    two_pair_ranks = [rank for rank in two_pair_ranks if not rank in three_card_ranks]
+    # Cards are scanned once into rank counts, a bitmask of ranks and a bitmask of ranks per suit
+    rank_counts = [0] * 15
+    suit_counts = [0] * 17
+    suit_masks = [0] * 17
+    rank_mask = 0
+    for cards in (hole, community):
+      for card in cards:
+        rank_counts[card.rank] += 1
+        suit_counts[card.suit] += 1
+        suit_masks[card.suit] |= 1 << card.rank
+        rank_mask |= 1 << card.rank
+
+    flash_suits = [suit for suit in self.__SUITS if suit_counts[suit] >= 5]
+    if flash_suits:
+      straight_flash_rank = self.__search_straight(suit_masks[flash_suits[-1]])
+      if straight_flash_rank != -1: return self.STRAIGHTFLASH | straight_flash_rank << 4
+
+    four_card_ranks = [rank for rank in range(2, 15) if rank_counts[rank] >= 4]
+    if four_card_ranks: return self.FOURCARD | four_card_ranks[0] << 4
+
+    three_card_ranks = [rank for rank in range(2, 15) if rank_counts[rank] >= 3]
+    pair_ranks = [rank for rank in range(2, 15) if rank_counts[rank] == 2]
     if len(three_card_ranks) == 2:
-      two_pair_ranks.append(min(three_card_ranks))
-    max_ = lambda l: None if len(l)==0 else max(l)
-    return max_(three_card_ranks), max_(two_pair_ranks)
+      pair_ranks.append(three_card_ranks[0])
+    if three_card_ranks and pair_ranks:
+      return self.FULLHOUSE | three_card_ranks[-1] << 4 | max(pair_ranks)
 
-  @classmethod
-  def __is_fourcard(self, cards):
-    return self.__eval_fourcard(cards) != 0
+    if flash_suits:
+      return self.FLASH | max(suit_masks[suit].bit_length() - 1 for suit in flash_suits) << 4
 
-  @classmethod
-  def __eval_fourcard(self, cards):
-    rank = self.__search_fourcard(cards)
-    return rank << 4
+    straight_rank = self.__search_straight(rank_mask)
+    if straight_rank != -1: return self.STRAIGHT | straight_rank << 4
 
-  @classmethod
-  def __search_fourcard(self, cards):
-    fetch_rank = lambda card: card.rank
-    for rank, group_obj in groupby(sorted(cards, key=fetch_rank), key=fetch_rank):
-      g = list(group_obj)
-      if len(g) >= 4:
-        return rank
-    return 0
+    if three_card_ranks: return self.THREECARD | three_card_ranks[-1] << 4
 
-  @classmethod
-  def __is_straightflash(self, cards):
-    return self.__search_straightflash(cards) != -1
+    # Every repeated card of a rank counts as a pair of that rank
+    repeated_ranks = [rank for rank in range(14, 1, -1) for _ in range(rank_counts[rank] - 1)]
+    if len(repeated_ranks) >= 2: return self.TWOPAIR | repeated_ranks[0] << 4 | repeated_ranks[1]
+    if repeated_ranks: return self.ONEPAIR | repeated_ranks[0] << 4
+    return self.__eval_holecard(hole)
 
   @classmethod
-  def __eval_straightflash(self, cards):
-    return self.__search_straightflash(cards) << 4
+  def __eval_holecard(self, hole):
+    ranks = sorted([card.rank for card in hole])
+    return ranks[1] << 4 | ranks[0]
 
   @classmethod
-  def __search_straightflash(self, cards):
-    flash_cards = []
-    fetch_suit = lambda card: card.suit
-    for suit, group_obj in groupby(sorted(cards, key=fetch_suit), key=fetch_suit):
-      g = list(group_obj)
-      if len(g) >= 5: flash_cards = g
-    return self.__search_straight(flash_cards)
+  def __search_straight(self, rank_mask):
+    # Highest rank starting five consecutive ranks, aces are counted only as high cards
+    for rank in range(10, 1, -1):
+      if rank_mask >> rank & 31 == 31: return rank
+    return -1
 
   @classmethod
   def __mask_hand_strength(self, bit):
@@ -0,0 +1,97 @@
+import pytest
+
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.game_evaluator import GameEvaluator
+from pypokerengine.engine.pay_info import PayInfo
+from pypokerengine.engine.player import Player
+from pypokerengine.engine.table import Table
+
+ALLIN, FOLDED, PAYING = PayInfo.ALLIN, PayInfo.FOLDED, PayInfo.PAY_TILL_END
+
+BOARD = ['C2', 'D7', 'H9', 'SJ', 'CK']
+
+""" Seats as (uuid, hole cards, paid amount, status) with pots, winners, hand info and prize map
+given by the original implementation, including zero-amount pots of equal all-in amounts and
+folded players left in the eligibles of the last pot. """
+CASES = [
+    ('several_allins',
+     [('a', ['SA', 'DA'], 50, ALLIN), ('b', ['SK', 'DK'], 100, ALLIN),
+      ('c', ['SQ', 'DQ'], 200, ALLIN), ('d', ['S3', 'D4'], 300, PAYING)],
+     [(200, 'abcd'), (150, 'bcd'), (200, 'cd'), (100, 'd')], 'b',
+     [('a', 'ONEPAIR', 14, 0), ('b', 'THREECARD', 13, 0), ('c', 'ONEPAIR', 12, 0), ('d', 'HIGHCARD', 4, 3)],
+     {0: 0, 1: 350, 2: 200, 3: 100}),
+    ('several_allins_short_stack_loses',
+     [('a', ['S3', 'D4'], 50, ALLIN), ('b', ['SK', 'DK'], 100, ALLIN),
+      ('c', ['SQ', 'DQ'], 200, ALLIN), ('d', ['SA', 'DA'], 200, PAYING)],
+     [(200, 'abcd'), (150, 'bcd'), (200, 'cd'), (0, 'cd')], 'b',
+     [('a', 'HIGHCARD', 4, 3), ('b', 'THREECARD', 13, 0), ('c', 'ONEPAIR', 12, 0), ('d', 'ONEPAIR', 14, 0)],
+     {0: 0, 1: 350, 2: 0, 3: 200}),
+    ('equal_allins',
+     [('a', ['SA', 'DA'], 100, ALLIN), ('b', ['SK', 'DK'], 100, ALLIN),
+      ('c', ['SQ', 'DQ'], 300, PAYING), ('d', ['S3', 'D4'], 300, PAYING)],
+     [(400, 'abcd'), (0, 'abcd'), (400, 'cd')], 'b',
+     [('a', 'ONEPAIR', 14, 0), ('b', 'THREECARD', 13, 0), ('c', 'ONEPAIR', 12, 0), ('d', 'HIGHCARD', 4, 3)],
+     {0: 0, 1: 400, 2: 400, 3: 0}),
+    ('equal_allins_called_exactly',
+     [('a', ['S3', 'D4'], 100, ALLIN), ('b', ['SK', 'DK'], 100, ALLIN), ('c', ['SQ', 'DQ'], 100, PAYING)],
+     [(300, 'abc'), (0, 'abc'), (0, 'abc')], 'b',
+     [('a', 'HIGHCARD', 4, 3), ('b', 'THREECARD', 13, 0), ('c', 'ONEPAIR', 12, 0)],
+     {0: 0, 1: 300, 2: 0}),
+    ('folded_players',
+     [('a', ['SA', 'DA'], 150, FOLDED), ('b', ['SK', 'DK'], 50, ALLIN),
+      ('c', ['SQ', 'DQ'], 150, PAYING), ('d', ['S3', 'D4'], 20, FOLDED)],
+     [(170, 'bc'), (200, 'ac')], 'b',
+     [('b', 'THREECARD', 13, 0), ('c', 'ONEPAIR', 12, 0)],
+     {0: 0, 1: 170, 2: 200, 3: 0}),
+    ('folded_after_allin',
+     [('a', ['SA', 'DA'], 30, ALLIN), ('b', ['SK', 'DK'], 100, FOLDED),
+      ('c', ['SQ', 'DQ'], 100, PAYING), ('d', ['S3', 'D4'], 100, PAYING)],
+     [(120, 'acd'), (210, 'bcd')], 'a',
+     [('a', 'ONEPAIR', 14, 0), ('c', 'ONEPAIR', 12, 0), ('d', 'HIGHCARD', 4, 3)],
+     {0: 120, 1: 0, 2: 210, 3: 0}),
+    ('split_pots',
+     [('a', ['SA', 'D8'], 40, ALLIN), ('b', ['HA', 'C8'], 120, ALLIN),
+      ('c', ['S3', 'D4'], 120, PAYING), ('d', ['S5', 'D6'], 10, FOLDED)],
+     [(130, 'abc'), (160, 'bc'), (0, 'bc')], 'ab',
+     [('a', 'HIGHCARD', 14, 8), ('b', 'HIGHCARD', 14, 8), ('c', 'HIGHCARD', 4, 3)],
+     {0: 65, 1: 225, 2: 0, 3: 0}),
+    ('single_active_player',
+     [('a', ['SA', 'DA'], 10, FOLDED), ('b', ['S3', 'D4'], 20, PAYING)],
+     [(30, 'b')], 'b', [], {0: 0, 1: 30}),
+]
+
+
+def _setup_table(seats):
+    table = Table()
+    for uuid, hole, amount, status in seats:
+        player = Player(uuid, 1000)
+        player.add_holecard([Card.from_str(card) for card in hole])
+        player.pay_info = PayInfo(amount, status)
+        table.seats.sitdown(player)
+    for card in BOARD:
+        table.add_community_card(Card.from_str(card))
+    return table
+
+
+def test_create_pot_matches_expected_pots():
+    for name, seats, pots, _, _, _ in CASES:
+        players = _setup_table(seats).seats.players
+        result = [(pot['amount'], ''.join(player.uuid for player in pot['eligibles']))
+                  for pot in GameEvaluator.create_pot(players)]
+        assert result == pots, name
+
+
+def test_judge_matches_expected_winners_hand_info_and_prizes():
+    for name, seats, _, winners, hand_info, prize_map in CASES:
+        result_winners, result_hand_info, result_prize_map = GameEvaluator.judge(_setup_table(seats))
+        assert ''.join(player.uuid for player in result_winners) == winners, name
+        assert [(info['uuid'], info['hand']['hand']['strength'], info['hand']['hand']['high'],
+                 info['hand']['hand']['low']) for info in result_hand_info] == hand_info, name
+        assert result_prize_map == prize_map, name
+
+
+def test_judge_raises_when_last_pot_has_only_folded_players():
+    table = _setup_table([('a', ['SA', 'DA'], 30, ALLIN), ('b', ['SK', 'DK'], 200, FOLDED),
+                          ('c', ['SQ', 'DQ'], 100, PAYING)])
+    with pytest.raises(ValueError):
+        GameEvaluator.judge(table)
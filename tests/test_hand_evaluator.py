@@ -0,0 +1,70 @@
+import hashlib
+import random
+
+from pypokerengine.engine.card import Card
+from pypokerengine.engine.hand_evaluator import HandEvaluator
+
+""" Hands with strengths and hand info of the original category search, including its quirks:
+straights ignore the ace-low wheel, the lowest quads win, the full house pair can come
+from a second set of trips and two pair takes the two highest of three pairs. """
+CASES = [
+    ('wheel_is_not_straight', ['SA', 'D2'], ['C3', 'H4', 'S5', 'DK', 'C9'], 58082,
+     {'strength': 'HIGHCARD', 'high': 14, 'low': 2}),
+    ('six_high_straight', ['SA', 'D2'], ['C3', 'H4', 'S5', 'D6', 'C9'], 532706,
+     {'strength': 'STRAIGHT', 'high': 2, 'low': 0}),
+    ('broadway_straight', ['SA', 'DK'], ['CQ', 'HJ', 'ST', 'D2', 'C3'], 565485,
+     {'strength': 'STRAIGHT', 'high': 10, 'low': 0}),
+    ('lowest_quads', ['C2', 'D2'], ['H2', 'S2', 'C9', 'D9', 'H9', 'S9'], 4202530,
+     {'strength': 'FOURCARD', 'high': 2, 'low': 0}),
+    ('quads', ['C9', 'D9'], ['H9', 'S9', 'CA', 'DK', 'H2'], 4231321,
+     {'strength': 'FOURCARD', 'high': 9, 'low': 0}),
+    ('trips_trips_full_house', ['CK', 'DK'], ['HK', 'C5', 'D5', 'H5', 'S9'], 2151901,
+     {'strength': 'FULLHOUSE', 'high': 13, 'low': 5}),
+    ('full_house', ['CK', 'DK'], ['HK', 'C5', 'D5', 'H7', 'S9'], 2151901,
+     {'strength': 'FULLHOUSE', 'high': 13, 'low': 5}),
+    ('three_pair', ['CK', 'DK'], ['C5', 'D5', 'H9', 'S9', 'CA'], 186845,
+     {'strength': 'TWOPAIR', 'high': 13, 'low': 9}),
+    ('two_pair', ['CK', 'D3'], ['C5', 'D5', 'HK', 'S9', 'CA'], 185811,
+     {'strength': 'TWOPAIR', 'high': 13, 'low': 5}),
+    ('one_pair', ['CK', 'D3'], ['C5', 'D7', 'HK', 'S9', 'CA'], 118995,
+     {'strength': 'ONEPAIR', 'high': 13, 'low': 0}),
+    ('three_card', ['C7', 'D7'], ['H7', 'S9', 'CA', 'D2', 'H4'], 290935,
+     {'strength': 'THREECARD', 'high': 7, 'low': 0}),
+    ('high_card', ['C7', 'DJ'], ['H2', 'S9', 'CA', 'D4', 'H5'], 47031,
+     {'strength': 'HIGHCARD', 'high': 11, 'low': 7}),
+    ('flush_of_six_cards', ['C2', 'C7'], ['C9', 'CJ', 'C4', 'CK', 'H5'], 1101938,
+     {'strength': 'FLASH', 'high': 13, 'low': 0}),
+    ('flush_beats_straight', ['C2', 'C3'], ['C4', 'D5', 'C6', 'CJ', 'H7'], 1093682,
+     {'strength': 'FLASH', 'high': 11, 'low': 0}),
+    ('straight_flush', ['H5', 'H6'], ['H7', 'H8', 'H9', 'HT', 'C2'], 8413285,
+     {'strength': 'STRAIGHTFLASH', 'high': 6, 'low': 0}),
+    ('straight_and_flush_of_other_cards', ['H5', 'D6'], ['H7', 'H8', 'H9', 'CT', 'HK'], 1101925,
+     {'strength': 'FLASH', 'high': 13, 'low': 0}),
+    ('two_holes_only', ['C7', 'DJ'], [], 47031,
+     {'strength': 'HIGHCARD', 'high': 11, 'low': 7}),
+]
+
+""" Digest of eval_hand of 5000 random 7 card hands of the original implementation """
+RANDOM_HANDS_DIGEST = '3e1810b208d0779cb8e554c41c10b7aa'
+
+
+def _cards(card_strings):
+    return [Card.from_str(card_string) for card_string in card_strings]
+
+
+def test_eval_hand_and_hand_info_match_expected_values():
+    for name, hole, community, strength, hand in CASES:
+        assert HandEvaluator.eval_hand(_cards(hole), _cards(community)) == strength, name
+        info = HandEvaluator.gen_hand_rank_info(_cards(hole), _cards(community))
+        assert info['hand'] == hand, name
+        assert info['hole'] == {'high': strength >> 4 & 15, 'low': strength & 15}, name
+        assert info['card'] == hole, name
+
+
+def test_eval_hand_of_random_hands_matches_expected_digest():
+    rng = random.Random(0)
+    digest = hashlib.md5()
+    for i in range(5000):
+        cards = [Card.from_id(card_id) for card_id in rng.sample(range(1, 53), 7)]
+        digest.update(str(HandEvaluator.eval_hand(cards[:2], cards[2:])).encode() + b',')
+    assert digest.hexdigest() == RANDOM_HANDS_DIGEST
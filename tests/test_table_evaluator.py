@@ -0,0 +1,23 @@
+import random
+
+import numpy as np
+
+from cfr_utils.table_evaluator import CARD_ID_TO_DEUCES, TableEvaluator
+from deuces.evaluator import Evaluator as DeucesEvaluator
+
+
+def _random_hands(num_hands, hand_size):
+    rng = random.Random(0)
+    return np.array([rng.sample(range(52), hand_size) for i in range(num_hands)])
+
+
+def test_evaluate_batch_matches_deuces_for_small_dtypes():
+    evaluator = TableEvaluator()
+    deuces_evaluator = DeucesEvaluator()
+    for hand_size in (5, 6, 7):
+        hands = _random_hands(500, hand_size)
+        expected = [deuces_evaluator.evaluate([CARD_ID_TO_DEUCES[card_id] for card_id in hand[:2]],
+                                              [CARD_ID_TO_DEUCES[card_id] for card_id in hand[2:]])
+                    for hand in hands.tolist()]
+        for dtype in (np.int8, np.uint8, np.int16, np.int64):
+            assert evaluator.evaluate_batch(hands.astype(dtype)).tolist() == expected
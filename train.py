@@ -1,10 +1,18 @@
+import os
 import resource
 import sys
-
-from cfr_utils.cfr import Cfr
+from argparse import ArgumentParser
+
+from cfr_utils.best_response import BestResponse
+from cfr_utils.bucket_model import BucketModel
+from cfr_utils.checkpoint import CheckpointWriter, load_checkpoint
+from cfr_utils.cfr import (CHANCE_SAMPLING, OUTCOME_SAMPLING, SAMPLING_SCHEMES, VANILLA, VARIANTS, Cfr,
+                            DiscountSchedule)
+from cfr_utils.vector_cfr import VectorCfr
 from constants import CALL, FOLD
 from cfr_utils.game import Game
 from cfr_utils.game_tree import ActionNode, BoardCardsNode, HoleCardsNode
+from cfr_utils.parallel import train_parallel
 
 try:
     from tqdm import tqdm
@@ -15,11 +23,39 @@ except ImportError:
 """Trains strategy for poker agent using CFR algorithm and writes it to specified file.
 
 Usage:
-python train.py {game_file_path} {iterations} {strategy_output_path}
+python train.py {iterations} {strategy_output_path} [--array-tree] [--variant {variant}]
+                [--dcfr-alpha {alpha}] [--dcfr-beta {beta}] [--dcfr-gamma {gamma}]
+                [--sampling {sampling}] [--exploration {epsilon}] [--workers {workers}]
+                [--vectorized [--bucket-model {path}] [--model-samples {samples}]]
+                [--checkpoint {path} [--checkpoint-every {iterations}] [--resume]]
+                [--eval-every {iterations}] [--pruning-threshold {regret}] [--pruning-interval {iterations}]
 
-  game_file_path: Path to ACPC game definition file of a poker game for which we want create the strategy.  
   iterations: Number of iterations for which the CFR algorithm will run.
   strategy_output_path: Path to file into which the result strategy will be written. 
+  --array-tree: Store the game tree in NumPy arrays, which needs far less memory.
+  --variant: CFR variant, one of vanilla, cfr+ (regret-matching+ with linear averaging)
+             or dcfr (discounted CFR).
+  --dcfr-alpha, --dcfr-beta, --dcfr-gamma: Discounting of positive regrets, negative regrets
+             and strategy sums in discounted CFR.
+  --sampling: Monte Carlo sampling scheme, one of chance, external or outcome.
+  --exploration: Exploration probability of outcome sampling. Variance statistics
+                 of the sampled utilities are printed after training to help tuning it.
+  --workers: Number of training processes sharing the regrets. Implies --array-tree.
+  --vectorized: Train with vectorized CFR over the public tree and all buckets at once.
+  --bucket-model: Path of the .npz bucket model used by vectorized CFR. It is loaded
+                  when the file exists and estimated and saved there otherwise.
+  --model-samples: Number of sampled deals used to estimate the bucket model.
+  --checkpoint: Path of the binary checkpoint of the training state. Implies --array-tree.
+  --checkpoint-every: Number of iterations between checkpoints. Only the final state
+                      is written when not provided.
+  --resume: Continue training from the checkpoint until the total number of iterations
+            is reached. CFR variant and sampling options are taken from the checkpoint.
+  --eval-every: Number of iterations between evaluations of exploitability of the average
+                strategy in the bucketed game. Implies --array-tree and uses the bucket model
+                from --bucket-model.
+  --pruning-threshold: Skip subtrees of actions with cumulative regret below this (negative)
+                       threshold. Disabled by default.
+  --pruning-interval: Number of iterations between full traversals that visit pruned actions.
 """
 
 def _action_to_str(action):
@@ -32,15 +68,14 @@ def _action_to_str(action):
 
 
 def _get_strategy_lines(lines, node, prefix=''):
-    node_type = type(node)
-    if node_type == HoleCardsNode or node_type == BoardCardsNode:
+    if isinstance(node, (HoleCardsNode, BoardCardsNode)):
         for key, child_node in node.children.items():
             new_prefix = prefix
             if new_prefix and not new_prefix.endswith(':'):
                 new_prefix += ':'
             new_prefix += ':'+ str(key) + ':'
             _get_strategy_lines(lines, child_node, new_prefix)
-    elif node_type == ActionNode:
+    elif isinstance(node, ActionNode):
         node_strategy_str = ' '.join([str(prob) for prob in node.average_strategy])
         lines.append('%s %s\n' % (prefix, node_strategy_str))
 
@@ -84,15 +119,93 @@ def _write_strategy(game_tree, iterations, output_path):
         _write_to_output_file(output_path, strategy_file_lines_sorted)
 
 
+def parse_arguments():
+    parser = ArgumentParser()
+    parser.add_argument('iterations', help="Number of CFR iterations", type=int)
+    parser.add_argument('output_path', help="Path of the strategy output file", type=str)
+    parser.add_argument('--array-tree', help="Store game tree in NumPy arrays", action='store_true')
+    parser.add_argument('--variant', help="CFR variant", choices=VARIANTS, default=VANILLA)
+    parser.add_argument('--dcfr-alpha', help="DCFR positive regret discount", default=1.5, type=float)
+    parser.add_argument('--dcfr-beta', help="DCFR negative regret discount", default=0.0, type=float)
+    parser.add_argument('--dcfr-gamma', help="DCFR strategy sum discount", default=2.0, type=float)
+    parser.add_argument('--sampling', help="Monte Carlo sampling scheme", choices=SAMPLING_SCHEMES,
+                        default=CHANCE_SAMPLING)
+    parser.add_argument('--exploration', help="Outcome sampling exploration", default=0.6, type=float)
+    parser.add_argument('--workers', help="Number of training processes", default=1, type=int)
+    parser.add_argument('--vectorized', help="Use vectorized public tree CFR", action='store_true')
+    parser.add_argument('--bucket-model', help="Path of the bucket model file", default=None, type=str)
+    parser.add_argument('--model-samples', help="Deals sampled to estimate bucket model", default=100000, type=int)
+    parser.add_argument('--checkpoint', help="Path of the training checkpoint", default=None, type=str)
+    parser.add_argument('--checkpoint-every', help="Iterations between checkpoints", default=None, type=int)
+    parser.add_argument('--resume', help="Resume training from the checkpoint", action='store_true')
+    parser.add_argument('--pruning-threshold', help="Regret-based pruning threshold", default=None, type=float)
+    parser.add_argument('--pruning-interval', help="Iterations between traversals without pruning", default=20,
+                        type=int)
+    parser.add_argument('--eval-every', help="Iterations between exploitability evaluations", default=None,
+                        type=int)
+    return parser.parse_args()
+
+
+def _get_bucket_model(game, model_path, num_samples):
+    if model_path and os.path.exists(model_path):
+        return BucketModel.load(model_path)
+    bucket_model = BucketModel.estimate(game, num_samples)
+    if model_path:
+        bucket_model.save(model_path)
+    return bucket_model
+
+
+def _get_next_stop(iteration, iterations, intervals):
+    """ Training stops at the end and at each multiple of checkpoint and evaluation intervals """
+    return min([iterations] + [(iteration // interval + 1) * interval for interval in intervals if interval])
+
+
 if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Usage {iterations} {strategy_output_path}")
+    args = parse_arguments()
+    if args.workers > 1 and args.vectorized:
+        print('Vectorized CFR cannot be trained on multiple processes')
         sys.exit(1)
-        
-    iterations = int(sys.argv[1])
-    output_path = sys.argv[2]
+    if args.checkpoint and args.vectorized:
+        print('Vectorized CFR does not support checkpoints')
+        sys.exit(1)
+    if (args.resume or args.checkpoint_every) and not args.checkpoint:
+        print('Path of the checkpoint has to be provided by --checkpoint')
+        sys.exit(1)
+    iterations = args.iterations
+    output_path = args.output_path
     game = Game()
-    cfr = Cfr(game)
-    cfr.train(iterations)
+    discount_schedule = DiscountSchedule(args.dcfr_alpha, args.dcfr_beta, args.dcfr_gamma)
+    bucket_model = None
+    if args.vectorized or args.eval_every:
+        bucket_model = _get_bucket_model(game, args.bucket_model, args.model_samples)
+    if args.resume:
+        cfr = load_checkpoint(game, args.checkpoint)
+    elif args.vectorized:
+        cfr = VectorCfr(game, bucket_model, variant=args.variant, discount_schedule=discount_schedule)
+    else:
+        array_tree = args.array_tree or args.workers > 1 or bool(args.checkpoint) or bool(args.eval_every)
+        cfr = Cfr(game, array_tree=array_tree, variant=args.variant, discount_schedule=discount_schedule,
+                  sampling=args.sampling, exploration=args.exploration, pruning_threshold=args.pruning_threshold,
+                  pruning_interval=args.pruning_interval)
+    checkpoint_writer = CheckpointWriter(args.checkpoint) if args.checkpoint else None
+    best_response = BestResponse(cfr.game_tree.tree, bucket_model) if args.eval_every else None
+    while cfr.iteration < iterations:
+        chunk_iterations = _get_next_stop(cfr.iteration, iterations,
+                                          [args.checkpoint_every, args.eval_every]) - cfr.iteration
+        if args.workers > 1:
+            train_parallel(cfr, chunk_iterations, args.workers)
+        else:
+            cfr.train(chunk_iterations)
+        if checkpoint_writer and (cfr.iteration == iterations or
+                                  (args.checkpoint_every and cfr.iteration % args.checkpoint_every == 0)):
+            checkpoint_writer.save(cfr)
+        if best_response and cfr.iteration % args.eval_every == 0:
+            print('Iteration %s exploitability: %s' % (cfr.iteration, best_response.get_exploitability()))
+    if checkpoint_writer:
+        checkpoint_writer.wait()
+
+    if not args.vectorized and args.workers == 1 and cfr.sampling == OUTCOME_SAMPLING:
+        print('Sampled utility: %s' % cfr.utility_statistics)
+        print('Importance weight: %s' % cfr.importance_weight_statistics)
 
     _write_strategy(cfr.game_tree, iterations, output_path)